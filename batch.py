@@ -0,0 +1,242 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+from config import (OUTPUT_DIR, EDIT_PLAN_FILE, TRANSCRIBE_SAMPLE_RATE, BATCH_TRANSCRIBE_WORKERS, BATCH_LLM_WORKERS,
+                    BATCH_RENDER_WORKERS, TRACE_FILE, TRACE_CHROME_FILE, setup_logging)
+from media.source import MediaSource
+from profiling.tracer import TRACER
+from speech.backends import SpeechBackend
+from vid_edit import VideoProcessor
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.webm', '.m4v')
+JOB_STATE_FILE = 'job.json'
+SPEECH_SEGMENTS_FILE = 'speech_segments.json'
+STAGES = ('transcribe', 'plan', 'render')
+
+
+def load_inputs(path: str) -> List[Dict[str, str]]:
+    # A directory of videos, or a manifest: a JSON list or JSON lines of paths or {"video": ..., "id": ...} objects
+    if os.path.isdir(path):
+        entries = [{'video': os.path.join(path, name)} for name in sorted(os.listdir(path))
+                   if name.lower().endswith(VIDEO_EXTENSIONS)]
+    else:
+        with open(path, 'r') as f:
+            text = f.read().strip()
+        entries = json.loads(text) if text.startswith('[') else [json.loads(line) for line in text.splitlines() if line.strip()]
+        base = os.path.dirname(os.path.abspath(path))
+        entries = [entry if isinstance(entry, dict) else {'video': entry} for entry in entries]
+        for entry in entries:
+            entry['video'] = os.path.join(base, entry['video'])
+    jobs, seen = [], set()
+    for entry in entries:
+        job_id = entry.get('id') or os.path.splitext(os.path.basename(entry['video']))[0]
+        while job_id in seen:
+            job_id += '_'
+        seen.add(job_id)
+        jobs.append({'id': job_id, 'video': entry['video']})
+    return jobs
+
+
+class BatchRunner:
+    """Runs many videos through the pipeline with each stage on its own bounded pool.
+
+    Transcription (decode plus speech calls), planning (translation and LLM calls) and rendering (CPU-bound encodes)
+    run concurrently across videos, so one video's encode overlaps the next one's network-bound stages. Every job
+    gets its own output and scratch directory and records each finished stage in its job.json; a rerun after a
+    crash picks every job up after its last finished stage.
+    """
+
+    def __init__(self, output_root: str = OUTPUT_DIR, transcribe_workers: int = BATCH_TRANSCRIBE_WORKERS,
+                 llm_workers: int = BATCH_LLM_WORKERS, render_workers: int = BATCH_RENDER_WORKERS,
+                 speech_backend: SpeechBackend = None, preview: bool = False):
+        self.output_root = output_root
+        self.workers = {'transcribe': transcribe_workers, 'plan': llm_workers, 'render': render_workers}
+        self.speech_backend = speech_backend
+        self.preview = preview
+        self._processors: Dict[str, VideoProcessor] = {}
+
+    def _job_dir(self, job: Dict) -> str:
+        return os.path.join(self.output_root, job['id'])
+
+    def load_state(self, job: Dict) -> Dict:
+        try:
+            with open(os.path.join(self._job_dir(job), JOB_STATE_FILE), 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'completed': []}
+        return state if state.get('video') == job['video'] else {'completed': []}
+
+    def _save_state(self, job: Dict, state: Dict):
+        path = os.path.join(self._job_dir(job), JOB_STATE_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(dict(state, video=job['video']), f, indent=2)
+        os.replace(tmp, path)
+
+    def _processor(self, job: Dict) -> VideoProcessor:
+        if job['id'] not in self._processors:
+            job_dir = self._job_dir(job)
+            self._processors[job['id']] = VideoProcessor(self.speech_backend, video_path=job['video'], output_dir=job_dir,
+                                                         scratch_dir=os.path.join(job_dir, "scratch"))
+        return self._processors[job['id']]
+
+    def _finish_stage(self, job: Dict, stage: str, **extra):
+        state = self.load_state(job)
+        state.update(extra)
+        state['completed'] = [s for s in STAGES if s in state['completed'] or s == stage]
+        state.pop('error', None)
+        self._save_state(job, state)
+
+    def transcribe(self, job: Dict) -> bool:
+        processor = self._processor(job)
+        with MediaSource(job['video'], sample_rate=TRANSCRIBE_SAMPLE_RATE) as source:
+            segments = processor.transcribe_segments(source)
+        transcript = ' '.join(segment['text'] for segment in segments if segment['text']).strip()
+        with open(os.path.join(self._job_dir(job), "transcript.txt"), 'w') as f:
+            f.write(transcript)
+        # Timestamps feed the edit selector's pause and keyword signals
+        with open(os.path.join(self._job_dir(job), SPEECH_SEGMENTS_FILE), 'w') as f:
+            json.dump([{key: segment[key] for key in ('text', 'start', 'end')} for segment in segments], f)
+        if not transcript:
+            # Left incomplete, so a resumed run transcribes again instead of planning from nothing
+            return False
+        self._finish_stage(job, 'transcribe')
+        return True
+
+    def plan(self, job: Dict) -> bool:
+        processor = self._processor(job)
+        with open(os.path.join(self._job_dir(job), "transcript.txt"), 'r') as f:
+            transcript = f.read()
+        try:
+            with open(os.path.join(self._job_dir(job), SPEECH_SEGMENTS_FILE), 'r') as f:
+                segments = json.load(f)
+        except FileNotFoundError:
+            segments = None
+        processor.reset_llm_context()
+        plan = processor.plan_from_transcript(transcript, job['video'], segments)
+        if plan is None:
+            return False
+        processor.save_plan(plan, os.path.join(self._job_dir(job), EDIT_PLAN_FILE))
+        self._finish_stage(job, 'plan')
+        return True
+
+    def render(self, job: Dict) -> bool:
+        processor = self._processor(job)
+        plan = processor.load_plan(os.path.join(self._job_dir(job), EDIT_PLAN_FILE))
+        if plan is None:
+            raise RuntimeError("edit plan is missing or stale")
+        output = processor.render_plan(plan, self.preview)
+        self._finish_stage(job, 'render', output=output)
+        return True
+
+    def run_stage(self, job: Dict, stage: str) -> bool:
+        with TRACER.span(f"batch.{stage}", job=job['id']):
+            return getattr(self, stage)(job)
+
+    def _next_stage(self, job: Dict) -> str:
+        completed = self.load_state(job)['completed']
+        return next((stage for stage in STAGES if stage not in completed), None)
+
+    def run(self, jobs: List[Dict]) -> Dict:
+        started = time.perf_counter()
+        results = {}
+        pools = {stage: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"batch-{stage}")
+                 for stage, workers in self.workers.items()}
+        pending = {}
+
+        def submit(job: Dict, stage: str):
+            pending[pools[stage].submit(self.run_stage, job, stage)] = (job, stage)
+
+        try:
+            for job in jobs:
+                os.makedirs(self._job_dir(job), exist_ok=True)
+                stage = self._next_stage(job)
+                if stage is None:
+                    logging.info(f"[{job['id']}] already rendered, skipping")
+                    results[job['id']] = 'skipped'
+                    continue
+                if stage != STAGES[0]:
+                    logging.info(f"[{job['id']}] resuming at {stage}")
+                submit(job, stage)
+            while pending:
+                finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, stage = pending.pop(future)
+                    try:
+                        proceed = future.result()
+                    except Exception as e:
+                        logging.error(f"[{job['id']}] {stage} failed: {e}")
+                        state = self.load_state(job)
+                        self._save_state(job, dict(state, error=f"{stage}: {e}"))
+                        results[job['id']] = 'failed'
+                        self._processors.pop(job['id'], None)
+                        continue
+                    if not proceed:
+                        logging.warning(f"[{job['id']}] nothing to edit after {stage}, stopping")
+                        results[job['id']] = 'empty'
+                        self._processors.pop(job['id'], None)
+                        continue
+                    if stage == STAGES[-1]:
+                        results[job['id']] = 'done'
+                        self._processors.pop(job['id'], None)
+                    else:
+                        submit(job, STAGES[STAGES.index(stage) + 1])
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        return self._summary(results, time.perf_counter() - started, 'pipelined')
+
+    def run_serial(self, jobs: List[Dict]) -> Dict:
+        # One video at a time through process_video, as running the script once per file would; the baseline for run()
+        started = time.perf_counter()
+        results = {}
+        for job in jobs:
+            try:
+                output = self._processor(job).process_video(preview=self.preview)
+                results[job['id']] = 'done' if output else 'empty'
+            except Exception as e:
+                logging.error(f"[{job['id']}] failed: {e}")
+                results[job['id']] = 'failed'
+            self._processors.pop(job['id'], None)
+        return self._summary(results, time.perf_counter() - started, 'serial')
+
+    def _summary(self, results: Dict[str, str], elapsed: float, mode: str) -> Dict:
+        done = sum(1 for status in results.values() if status == 'done')
+        summary = {
+            'mode': mode,
+            'jobs': results,
+            'done': done,
+            'failed': sum(1 for status in results.values() if status == 'failed'),
+            'elapsed_seconds': elapsed,
+            'videos_per_hour': done * 3600 / elapsed if elapsed > 0 else 0.0,
+        }
+        os.makedirs(self.output_root, exist_ok=True)
+        with open(os.path.join(self.output_root, f"batch_summary_{mode}.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        logging.info(f"Batch ({mode}): {done} of {len(results)} videos in {elapsed:.1f}s "
+                     f"({summary['videos_per_hour']:.1f} videos/hour)")
+        TRACER.log_summary()
+        TRACER.export(self.output_root, f"{mode}_{TRACE_FILE}", f"{mode}_{TRACE_CHROME_FILE}")
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('inputs', help="Directory of videos, or a manifest (JSON list or JSON lines)")
+    parser.add_argument('--output-root', default=OUTPUT_DIR, help="One sub-directory per job is created here")
+    parser.add_argument('--preview', action='store_true', help="Render previews from proxies instead of final videos")
+    parser.add_argument('--serial', action='store_true', help="Process one video at a time (baseline for comparison)")
+    parser.add_argument('--sample-frames', type=int, metavar='N', default=TRACER.frame_sample_every,
+                        help="Time every Nth frame of each effect and transition kernel (0 disables)")
+    args = parser.parse_args()
+    setup_logging()
+    TRACER.frame_sample_every = args.sample_frames
+    runner = BatchRunner(args.output_root, preview=args.preview)
+    jobs = load_inputs(args.inputs)
+    summary = runner.run_serial(jobs) if args.serial else runner.run(jobs)
+    print(json.dumps(summary, indent=2))
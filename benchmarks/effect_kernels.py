@@ -0,0 +1,76 @@
+"""Per-effect and fused frames/sec: moviepy vfx path vs effects.kernels.FusedKernel.
+
+    python -m benchmarks.effect_kernels --width 1920 --height 1080 --frames 60 --batch 8
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from moviepy.editor import VideoClip, vfx
+
+from effects.kernels import FusedKernel
+
+MOVIEPY = {
+    'colorx': lambda clip: clip.fx(vfx.colorx, 1.5),
+    'brightness': lambda clip: clip.fx(vfx.colorx, 1.2),
+    'saturation': lambda clip: clip.fx(vfx.colorx, 1.5),
+    'lum_contrast': lambda clip: clip.fx(vfx.lum_contrast, 0, 0.5),
+    'invert_colors': lambda clip: clip.fx(vfx.invert_colors),
+    'blackwhite': lambda clip: clip.fx(vfx.blackwhite),
+}
+
+CHAIN = ['lum_contrast', 'saturation', 'brightness', 'invert_colors']
+
+
+def synthetic_clip(width: int, height: int, frames: int, fps: int = 25) -> VideoClip:
+    rng = np.random.default_rng(0)
+    pool = rng.integers(0, 256, size=(4, height, width, 3), dtype=np.uint8)
+    return VideoClip(lambda t: pool[int(t * fps) % len(pool)], duration=frames / fps).set_fps(fps)
+
+
+def fps_of(clip, frames: int) -> float:
+    started = time.perf_counter()
+    for _ in clip.iter_frames(dtype='uint8'):
+        pass
+    return frames / (time.perf_counter() - started)
+
+
+def fps_batched(kernel: FusedKernel, clip, frames: int, batch: int) -> float:
+    started = time.perf_counter()
+    for _ in kernel.iter_batches(clip, batch):
+        pass
+    return frames / (time.perf_counter() - started)
+
+
+def run(width: int, height: int, frames: int, batch: int) -> dict:
+    source = synthetic_clip(width, height, frames)
+    results = {'resolution': f"{width}x{height}", 'frames': frames, 'source_fps': fps_of(source, frames), 'effects': {}}
+    for name, moviepy_fx in MOVIEPY.items():
+        kernel = FusedKernel([(name, {})])
+        results['effects'][name] = {
+            'moviepy_fps': fps_of(moviepy_fx(source), frames),
+            'kernel_fps': fps_of(kernel.apply(source), frames),
+            'kernel_batched_fps': fps_batched(kernel, source, frames, batch),
+        }
+    chained = source
+    for name in CHAIN:
+        chained = MOVIEPY[name](chained)
+    fused = FusedKernel([(name, {}) for name in CHAIN])
+    results['chain'] = {
+        'effects': CHAIN,
+        'moviepy_fps': fps_of(chained, frames),
+        'fused_fps': fps_of(fused.apply(source), frames),
+        'fused_batched_fps': fps_batched(fused, source, frames, batch),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--batch', type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.width, args.height, args.frames, args.batch), indent=2))
@@ -0,0 +1,85 @@
+"""Speed vs size vs quality of every encoding profile in render/profiles.py.
+
+    python -m benchmarks.encode_profiles --source input.mp4 --seconds 10
+    python -m benchmarks.encode_profiles --width 1280 --height 720 --seconds 5
+
+Without --source a synthetic clip (moving gradients and shapes) is encoded. Quality is PSNR of the decoded
+output against the RGB frames fed to the encoder, so even the lossless profile loses a little to yuv420p chroma
+subsampling. 'moviepy-default' is the write_videofile(codec='libx264') call every write site used before profiles.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from moviepy.editor import VideoClip, VideoFileClip
+
+from render.profiles import PROFILES, write_kwargs
+
+
+def synthetic_clip(width: int, height: int, seconds: float, fps: int = 25) -> VideoClip:
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+
+    def make_frame(t):
+        frame = np.empty((height, width, 3), np.uint8)
+        frame[..., 0] = (x / width * 255 + t * 40) % 256
+        frame[..., 1] = (y / height * 255) % 256
+        frame[..., 2] = 128 + 127 * np.sin(x / 40 + t * 3) * np.cos(y / 30)
+        cx, cy = int((0.2 + 0.6 * (t / seconds)) * width), height // 2
+        frame[max(0, cy - 60):cy + 60, max(0, cx - 60):cx + 60] = (255, 255, 255)
+        return frame
+
+    return VideoClip(make_frame, duration=seconds).set_fps(fps)
+
+
+def psnr(reference: VideoClip, decoded: VideoFileClip) -> float:
+    errors = []
+    for t in np.arange(0, min(reference.duration, decoded.duration) - 0.5 / reference.fps, 1 / reference.fps):
+        a = reference.get_frame(t).astype(np.float32)
+        b = decoded.get_frame(t).astype(np.float32)
+        errors.append(np.mean((a - b) ** 2))
+    mse = float(np.mean(errors))
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def run(clip: VideoClip, profiles) -> dict:
+    frames = int(round(clip.duration * clip.fps))
+    results = {'resolution': f"{clip.size[0]}x{clip.size[1]}", 'frames': frames, 'profiles': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ['moviepy-default'] + list(profiles):
+            output = os.path.join(directory, f"{name}.mp4")
+            kwargs = {'codec': 'libx264'} if name == 'moviepy-default' else write_kwargs(name)
+            started = time.perf_counter()
+            clip.write_videofile(output, audio=False, logger=None, **kwargs)
+            encode = time.perf_counter() - started
+            decoded = VideoFileClip(output, audio=False)
+            started = time.perf_counter()
+            for _ in decoded.iter_frames():
+                pass
+            decode = time.perf_counter() - started
+            results['profiles'][name] = {
+                'encode_fps': frames / encode,
+                'decode_fps': frames / decode,
+                'mbit_per_s': os.path.getsize(output) * 8 / 1e6 / clip.duration,
+                'psnr_db': psnr(clip, decoded),
+            }
+            decoded.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', help="Video to encode; a synthetic clip is used when omitted")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--profiles', nargs='*', default=list(PROFILES))
+    args = parser.parse_args()
+    if args.source:
+        clip = VideoFileClip(args.source, audio=False)
+        clip = clip.subclip(0, min(args.seconds, clip.duration))
+    else:
+        clip = synthetic_clip(args.width, args.height, args.seconds)
+    print(json.dumps(run(clip, args.profiles), indent=2))
@@ -0,0 +1,59 @@
+"""Geometric effect cost: remap table build (cold / cached) and per-frame gather, bilinear and nearest.
+
+    python -m benchmarks.geometric_warps --width 1920 --height 1080
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from effects.warps import Warper, WarpCache, crop_table, resize_table, rotate_table, scroll_table, zoom_table
+import effects.warps as warps
+
+
+def timed(fn, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(width: int, height: int, repeat: int) -> dict:
+    frame = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    size = (width, height)
+    transforms = {
+        'zoom': lambda interpolation: zoom_table(size, 1.05, interpolation),
+        'rotate': lambda interpolation: rotate_table(size, 30, interpolation),
+        'resize': lambda interpolation: resize_table(size, (width // 3, height // 3), interpolation),
+        'crop_center': lambda interpolation: crop_table(size, (width / 2, height / 2), (width // 3, height // 3)),
+        'scroll': lambda interpolation: scroll_table(size, height // 10),
+    }
+    results = {'resolution': f"{width}x{height}", 'transforms': {}}
+    for name, table_for in transforms.items():
+        for interpolation in ('bilinear', 'nearest'):
+            warps.WARPS = WarpCache()
+            build_s = timed(lambda: table_for(interpolation))
+            table = table_for(interpolation)
+            warper = Warper(name)
+            warper(frame, table)
+            frame_s = timed(lambda: warper(frame, table), repeat)
+            results['transforms'][f"{name}/{interpolation}"] = {
+                'build_ms': build_s * 1000,
+                'cache_hit_ms': timed(lambda: table_for(interpolation), 100) * 1000,
+                'table_mb': table.nbytes / 2 ** 20,
+                'ms_per_frame': frame_s * 1000,
+                'fps': 1 / frame_s,
+            }
+            if name in ('crop_center', 'scroll'):
+                break
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.width, args.height, args.repeat), indent=2))
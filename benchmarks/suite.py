@@ -0,0 +1,256 @@
+"""Benchmark suite: frames/sec of every effect and transition, and the end-to-end pipeline, on synthetic videos.
+
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --output bench.json --baseline benchmarks/baseline.json
+
+Frames/sec depend on the machine, so no baseline is committed: run the first command once on the machine that will do
+the comparisons (and again after an intended speed change), then compare later runs against it with the second.
+
+Inputs are generated locally with ffmpeg's test sources (deterministic), once per resolution and length. Every metric
+is higher-is-better: frames/sec for effects and transitions (decoding included, `decode` is the floor), and the
+realtime factor (seconds of video per wall-clock second) for the pipeline. The pipeline runs process_video with the
+speech backend, translator and LLM stubbed, into a fresh output directory and render cache, so only local work is
+timed. Edits come from the stubbed LLM selector whatever EDIT_SELECTOR is set to, so changing a heuristic selector
+rule doesn't move the pipeline baseline. With --baseline, a metric that drops by more than the threshold fails the run (exit status 1).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from unittest import mock
+
+import moviepy
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.editor import VideoFileClip
+
+from config import EFFECTS_FILE, TRANSITIONS_FILE, TRANSITION_DURATION
+from effects.effects import VideoEffects
+from profiling.tracer import TRACER
+from render.cache import RenderCache
+from speech.backends import SpeechBackend
+from transitions.transitions import TransitionEffects
+from translation.backends import IdentityBackend
+from translation.translator import ChunkedTranslator
+import vid_edit
+
+DEFAULT_THRESHOLD = 0.25
+PIPELINE_EFFECTS = ['blackwhite', 'colorx', 'invert_colors', 'mirror_x']
+PIPELINE_TRANSITIONS = ['crossfade_transition', 'circle_reveal_transition', 'starfield_transition']
+
+
+def make_video(directory: str, width: int, height: int, seconds: float, fps: int = 25, pattern: str = 'testsrc2') -> str:
+    path = os.path.join(directory, f"{pattern}_{width}x{height}_{seconds:g}s_{fps}fps.mp4")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.mp4"
+    subprocess.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+                    '-f', 'lavfi', '-i', f"{pattern}=size={width}x{height}:rate={fps}:duration={seconds:g}",
+                    '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={seconds:g}",
+                    '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '18', '-g', str(fps), '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', '-shortest', tmp], check=True)
+    os.replace(tmp, path)
+    return path
+
+
+def frames_per_second(clip, repeat: int) -> float:
+    # Best of several passes: on a shared machine the fastest pass is the one least disturbed by other work
+    best = 0.0
+    for _ in range(repeat):
+        frames = 0
+        started = time.perf_counter()
+        for _ in clip.iter_frames(dtype='uint8'):
+            frames += 1
+        best = max(best, frames / (time.perf_counter() - started))
+    return best
+
+
+def load_names(path: str, key: str) -> List[str]:
+    with open(path, 'r') as f:
+        return [entry['name'].strip() for entry in json.load(f)[key]]
+
+
+def bench_effects(path: str, seconds: float, repeat: int) -> Dict[str, float]:
+    results = {}
+    source = VideoFileClip(path)
+    try:
+        clip = source.subclip(0, min(seconds, source.duration))
+        results['decode'] = frames_per_second(clip, repeat)
+        for name in load_names(EFFECTS_FILE, 'effects'):
+            try:
+                results[f"effect/{name}"] = frames_per_second(VideoEffects.apply_effect(clip, name), repeat)
+            except Exception as e:
+                results[f"effect/{name}"] = {'error': f"{type(e).__name__}: {e}"}
+    finally:
+        source.close()
+    return results
+
+
+def bench_transitions(path1: str, path2: str, repeat: int) -> Dict[str, float]:
+    results = {}
+    clip1, clip2 = VideoFileClip(path1), VideoFileClip(path2)
+    try:
+        # The same windows TransitionEffects.apply_transition hands a transition
+        tail = clip1.subclip(max(0, clip1.duration - TRANSITION_DURATION))
+        head = clip2.subclip(0, min(TRANSITION_DURATION, clip2.duration))
+        for name in load_names(TRANSITIONS_FILE, 'transitions'):
+            method = getattr(TransitionEffects, name, None)
+            if method is None:
+                results[f"transition/{name}"] = {'error': "not implemented"}
+                continue
+            try:
+                results[f"transition/{name}"] = frames_per_second(method(tail, head), repeat)
+            except Exception as e:
+                results[f"transition/{name}"] = {'error': f"{type(e).__name__}: {e}"}
+    finally:
+        clip1.close()
+        clip2.close()
+    return results
+
+
+class StubSpeechBackend(SpeechBackend):
+    def recognize(self, audio):
+        return [{'text': 'benchmark speech', 'start': 0.0, 'end': 1.0, 'words': []}]
+
+
+def stub_llm(duration: float, topics: int = 3):
+    # Topic splits cover the whole video evenly; picks cycle through fixed lists, so every run edits alike
+    def llm(prompt, context=None):
+        bounds = np.linspace(0, duration, topics + 1)
+        return '\n'.join(f"{start:.2f} - {end:.2f}" for start, end in zip(bounds[:-1], bounds[1:]))
+
+    def llm_batch(prompts, context=None):
+        effects = [p for p in prompts if 'transition' not in p]
+        transitions = [p for p in prompts if 'transition' in p]
+        return ([PIPELINE_EFFECTS[i % len(PIPELINE_EFFECTS)] for i in range(len(effects))] +
+                [PIPELINE_TRANSITIONS[i % len(PIPELINE_TRANSITIONS)] for i in range(len(transitions))])
+    return llm, llm_batch
+
+
+def bench_pipeline(path: str, seconds: float, repeat: int) -> Tuple[float, Dict]:
+    llm, llm_batch = stub_llm(seconds)
+    best, stages = 0.0, {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(vid_edit, 'LLM', llm), mock.patch.object(vid_edit, 'LLM_batch', llm_batch), \
+                mock.patch.object(vid_edit, 'EDIT_SELECTOR', 'llm'):
+            processor = vid_edit.VideoProcessor(StubSpeechBackend(), video_path=path, output_dir=os.path.join(directory, 'out'))
+            processor.translator = ChunkedTranslator(IdentityBackend())
+            processor.render_cache = RenderCache(os.path.join(directory, 'render'))
+            TRACER.drain()
+            started = time.perf_counter()
+            if processor.process_video() is None:
+                raise RuntimeError("pipeline produced no output")
+            factor = seconds / (time.perf_counter() - started)
+            if factor > best:
+                best = factor
+                stages = {name: round(stage['seconds'], 3) for name, stage in TRACER.summary()['stages'].items()
+                          if stage['category'] == 'stage'}
+    return best, stages
+
+
+def run(resolutions: List[Tuple[int, int]], clip_seconds: float, lengths: List[float], repeat: int,
+        video_dir: str, pipeline: bool = True) -> Dict:
+    results = {'environment': environment(), 'settings': {'resolutions': [f"{w}x{h}" for w, h in resolutions],
+               'clip_seconds': clip_seconds, 'pipeline_lengths': lengths, 'repeat': repeat},
+               'metrics': {}, 'errors': {}, 'pipeline_stages': {}}
+
+    def record(prefix: str, values: Dict):
+        for name, value in values.items():
+            if isinstance(value, dict):
+                results['errors'][f"{prefix}/{name}"] = value['error']
+            else:
+                results['metrics'][f"{prefix}/{name}"] = round(value, 3)
+
+    for width, height in resolutions:
+        resolution = f"{width}x{height}"
+        print(f"Benchmarking effects and transitions at {resolution}", file=sys.stderr)
+        clip = make_video(video_dir, width, height, clip_seconds)
+        other = make_video(video_dir, width, height, clip_seconds, pattern='smptehdbars')
+        record(resolution, bench_effects(clip, clip_seconds, repeat))
+        record(resolution, bench_transitions(clip, other, repeat))
+        if not pipeline:
+            continue
+        for seconds in lengths:
+            name = f"{resolution}/pipeline/{seconds:g}s"
+            print(f"Benchmarking the pipeline on {seconds:g}s at {resolution}", file=sys.stderr)
+            try:
+                factor, stages = bench_pipeline(make_video(video_dir, width, height, seconds), seconds, repeat)
+            except Exception as e:
+                results['errors'][name] = f"{type(e).__name__}: {e}"
+                continue
+            results['metrics'][name] = round(factor, 3)
+            results['pipeline_stages'][name] = stages
+    return results
+
+
+def environment() -> Dict:
+    ffmpeg = subprocess.run([get_setting("FFMPEG_BINARY"), '-version'], capture_output=True, text=True).stdout
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__, 'moviepy': moviepy.__version__,
+            'ffmpeg': ffmpeg.splitlines()[0] if ffmpeg else None}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> Dict:
+    # A baseline may carry per-metric thresholds ({"thresholds": {"1280x720/pipeline/30s": 0.3}}) for noisy metrics
+    thresholds = baseline.get('thresholds', {})
+    report = {'regressions': [], 'improvements': [], 'missing': [], 'new': []}
+    for name, before in baseline['metrics'].items():
+        after = results['metrics'].get(name)
+        if after is None:
+            report['missing'].append(name)
+            continue
+        change = (after - before) / before if before else 0.0
+        entry = {'metric': name, 'baseline': before, 'current': after, 'change': round(change, 3)}
+        if change < -thresholds.get(name, threshold):
+            report['regressions'].append(entry)
+        elif change > thresholds.get(name, threshold):
+            report['improvements'].append(entry)
+    report['new'] = sorted(set(results['metrics']) - set(baseline['metrics']))
+    return report
+
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resolutions', default='640x360,1280x720', help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument('--clip-seconds', type=float, default=2.0, help="Length of the clips effects and transitions run on")
+    parser.add_argument('--lengths', default='10,30', help="Comma-separated pipeline video lengths in seconds")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes per measurement; the fastest one counts")
+    parser.add_argument('--no-pipeline', action='store_true')
+    parser.add_argument('--video-dir', default=os.path.join('cache', 'benchmarks'), help="Where synthetic inputs are kept")
+    parser.add_argument('--output', help="Write the results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="Compare against this results file and fail on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative drop of a metric before it counts as a regression")
+    parser.add_argument('--save-baseline', help="Also write the results here, as the baseline for later runs")
+    args = parser.parse_args()
+
+    results = run([parse_resolution(r) for r in args.resolutions.split(',')], args.clip_seconds,
+                  [float(s) for s in args.lengths.split(',')], args.repeat, args.video_dir, not args.no_pipeline)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            results['comparison'] = compare(results, json.load(f), args.threshold)
+        for entry in results['comparison']['regressions']:
+            print(f"REGRESSION {entry['metric']}: {entry['baseline']} -> {entry['current']} ({entry['change']:+.0%})",
+                  file=sys.stderr)
+        status = 1 if results['comparison']['regressions'] else 0
+    text = json.dumps(results, indent=2)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+    if not args.output:
+        print(text)
+    sys.exit(status)
@@ -0,0 +1,61 @@
+"""Shape-transition cost: mask family generation (cold / cached / memory-mapped) and per-frame blend.
+
+    python -m benchmarks.transition_masks --width 1920 --height 1080 --frames 25
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from transitions.masks import SHAPES, MaskCache, blend, generate_masks
+
+
+def timed(fn, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def per_frame_recompute(shape, frame1, frame2, frames):
+    # What the transitions did before: rebuild the shape and blend in float for every frame
+    h, w = frame1.shape[:2]
+    for k in range(frames):
+        alpha = (SHAPES[shape](w, h) <= (k + 1) / frames).astype(np.float32)[..., None]
+        (frame1 * (1 - alpha) + frame2 * alpha).astype(np.uint8)
+
+
+def run(width: int, height: int, frames: int) -> dict:
+    rng = np.random.default_rng(0)
+    frame1 = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    frame2 = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    results = {'resolution': f"{width}x{height}", 'frames': frames, 'shapes': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        memory, mapped = MaskCache(), MaskCache(directory=directory)
+        for shape in SHAPES:
+            mapped.get(shape, (width, height), frames)
+            reopened = MaskCache(directory=directory)
+            masks = memory.get(shape, (width, height), frames)
+            work = {}
+            blend_s = timed(lambda: [blend(frame1, frame2, masks[k], work) for k in range(frames)]) / frames
+            results['shapes'][shape] = {
+                'generate_ms': timed(lambda: generate_masks(shape, (width, height), frames)) * 1000,
+                'cache_hit_ms': timed(lambda: memory.get(shape, (width, height), frames), 100) * 1000,
+                'memmap_open_ms': timed(lambda: reopened.get(shape, (width, height), frames)) * 1000,
+                'family_mb': masks.nbytes / 2 ** 20,
+                'blend_ms_per_frame': blend_s * 1000,
+                'blend_fps': 1 / blend_s,
+                'recompute_fps': frames / timed(lambda: per_frame_recompute(shape, frame1, frame2, frames)),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=25)
+    args = parser.parse_args()
+    print(json.dumps(run(args.width, args.height, args.frames), indent=2))
@@ -3,29 +3,100 @@ import logging
 
 GROK_API_KEY = os.getenv("GROK_API_KEY")
 
+# LLM Settings
+LLM_MODEL = "llama3-70b-8192"
+LLM_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")  # Point at a local fake server in tests
+LLM_MAX_CONCURRENCY = 4
+LLM_REQUESTS_PER_MINUTE = 30  # Starting budget; refined from the x-ratelimit-* response headers
+LLM_TOKENS_PER_MINUTE = 6000
+LLM_MAX_RETRIES = 5
+LLM_CONTEXT_TOKEN_BUDGET = 6000  # Prompt budget per call; llama3-70b-8192 leaves the rest for the reply
+LLM_CACHE_PATH = 'cache/llm_cache.sqlite'
+LLM_CACHE_TTL = 30 * 24 * 3600  # Seconds; None keeps responses forever
+LLM_CACHE_MAX_ENTRIES = 20000
+
 # Input/Output Paths
 VIDEO_PATH = 'input/video.mp4'
-AUDIO_PATH = 'input/audio.wav'
 OUTPUT_DIR = 'output'
 
 # Transcription and Translation Settings
 TRANSCRIBE_LANGUAGE = 'auto'  # Changed to 'auto' for auto-detection
+SPEECH_BACKEND = 'google_cloud'  # 'google_cloud' or 'sphinx' (offline)
+TRANSCRIBE_SAMPLE_RATE = 16000  # PCM rate streamed to the recognizer
+TRANSCRIBE_WINDOW_SECONDS = 50  # Google Cloud sync recognition caps requests at 60s
+TRANSCRIBE_OVERLAP_SECONDS = 1  # Overlap used when no silence is found near a window cut
+TRANSCRIBE_SILENCE_THRESHOLD = 0.01  # RMS (fraction of full scale) below which a frame counts as silence
+TRANSCRIBE_WORKERS = 4
 TRANSLATE_LANGUAGE = 'en'
+TRANSLATE_BACKEND = 'google'  # 'google' (googletrans) or 'identity' (leaves text as is; offline runs and tests)
+TRANSLATE_CHUNK_CHARS = 4500  # Characters per request; Google Translate's web endpoint rejects texts over 5000
+TRANSLATE_WORKERS = 4  # Chunks translated at once
+TRANSLATE_CACHE_PATH = 'cache/translation_cache.sqlite'  # Chunk translations keyed by text hash and language pair
+TRANSLATE_CACHE_MAX_ENTRIES = 50000
+
+# Rendering Settings
+RENDER_WORKERS = max(1, (os.cpu_count() or 1) // 4)  # Parallel segment encoders; 1 renders in-process
+RENDER_THREADS_PER_ENCODER = 4  # libx264 threads per encoder
+RENDER_MAX_RETRIES = 1  # Retries for a segment whose encode failed
+SMART_RENDER = True  # Stream-copy GOPs that no effect touches; only re-encode around cuts and effect ranges
+INTERMEDIATE_PROFILE = 'intermediate-lossless-fast'  # Encoding profile (render/profiles.py) for segments and transitions
+RENDER_PROFILE = 'final'  # Encoding profile of the finished video
+PREVIEW_HEIGHT = 360  # Proxy resolution used by preview renders
+PREVIEW_FPS = 12
+PREVIEW_PROFILE = 'preview'
+PROXY_DIR = 'cache/proxies'
+EDIT_PLAN_FILE = 'edit_plan.json'  # Edit decisions saved in OUTPUT_DIR and reused by later renders
+RENDER_CACHE_DIR = 'cache/render'  # Rendered segments and transitions, shared across runs and jobs
+RENDER_CACHE_MAX_BYTES = 20 * 1024 ** 3
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+SEEK_INDEX_SUFFIX = '.index.json'  # Keyframe/seek index cached next to each source (video.mp4.index.json)
+SEEK_INDEX_DIR = 'cache/index'  # Where indexes go when the source's directory isn't writable
+TOPIC_KEYFRAME_SNAP = 0  # Seconds a topic boundary may move to land on a keyframe (lets smart render copy from the cut); 0 disables
+
+# Batch Settings (batch.py)
+BATCH_TRANSCRIBE_WORKERS = 2  # Videos decoded and transcribed at once
+BATCH_LLM_WORKERS = 4  # Videos planned at once; all share the LLM client's rate limits
+BATCH_RENDER_WORKERS = 1  # Videos rendered at once; each also uses RENDER_WORKERS encoders
 
 # Transitions Settings
 TRANSITIONS_FILE = 'transitions/transitions.json'
+TRANSITION_DURATION = 1  # Seconds of each segment's tail/head handed to a transition
+TRANSITION_MASK_CACHE_BYTES = 256 * 1024 * 1024  # In-memory budget for precomputed shape masks
+TRANSITION_MASK_DIR = 'cache/masks'  # Memory-mapped mask store shared across jobs; None keeps masks in memory only
+TRANSITION_MASK_DIR_MAX_BYTES = 2 * 1024 ** 3  # Least recently used mask files beyond this are deleted
+TEXTURE_CACHE_BYTES = 128 * 1024 * 1024  # In-memory budget for procedural transition textures
+TEXTURE_SEED = 0  # Fixed seed so procedural transitions render identically across runs
+WARP_CACHE_BYTES = 256 * 1024 * 1024  # In-memory budget for zoom/rotate/resize remap tables
+WARP_INTERPOLATION = 'bilinear'  # Sampling for geometric effects: 'bilinear', or 'nearest' for speed
 
 # Effects Settings
 EFFECTS_FILE = 'effects/effects.json'
 
+# Edit Selection Settings
+EDIT_SELECTOR = 'heuristic'  # 'heuristic' (local signals, no network), 'heuristic+llm' (one LLM call refines every pick), 'llm' (one prompt per pick)
+SELECTOR_SAMPLE_FPS = 2  # Frames per second decoded (as 64x36 thumbnails) for motion, cut and brightness signals
+
 # Logging Settings
 LOG_LEVEL = 'INFO'
 LOG_FILE = 'logs/video_processing.log'
 
+# Tracing Settings
+TRACE_FILE = 'trace.json'  # Per-stage spans and totals, written next to the output
+TRACE_CHROME_FILE = 'trace.chrome.json'  # Same spans for chrome://tracing or ui.perfetto.dev
+TRACE_FRAME_SAMPLE_EVERY = 0  # Time every Nth frame of effect and transition kernels; 0 disables frame sampling
+
 # Initialize Logger
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=LOG_LEVEL,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
\ No newline at end of file
+def setup_logging(level=LOG_LEVEL, log_file=LOG_FILE):
+    # Called by the entry points rather than on import, so importing config needs no logs/ directory and
+    # messages reach both the console and the log file
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(
+        handlers=handlers,
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        force=True
+    )
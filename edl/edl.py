@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+EDL_VERSION = 1
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(',', ':')).encode()).hexdigest()[:24]
+
+
+class EditDecisionList:
+    """Everything a render needs, and nothing it derives: topics with their time ranges and effect,
+    and the transition at each boundary between consecutive segments.
+
+    Every segment and transition hashes to a key over its own entry, the source (its content digest when one is
+    given, else its fingerprint) and the encoder settings; a transition's key also covers both neighbouring segment keys. Changing one segment's effect
+    therefore invalidates that segment and its two transitions, and nothing else.
+    """
+
+    def __init__(self, source: str, fingerprint: Dict, segments: List[Dict], transitions: List[Optional[Dict]],
+                 transition_duration: float = 1.0, version: int = EDL_VERSION):
+        self.source = source
+        self.fingerprint = fingerprint
+        self.segments = segments
+        self.transitions = transitions
+        self.transition_duration = transition_duration
+        self.version = version
+
+    @classmethod
+    def from_suggestions(cls, source: str, fingerprint: Dict, topics: List[Dict[str, float]], effect_names: List[str],
+                         transition_names: List[str], transition_duration: float = 1.0) -> "EditDecisionList":
+        segments = [{'start': topic['start'], 'end': topic['end'],
+                     'effect': effect_names[i] if i < len(effect_names) else None, 'kwargs': {}}
+                    for i, topic in enumerate(topics)]
+        transitions = [{'name': transition_names[i], 'kwargs': {}} if i < len(transition_names) and transition_names[i] else None
+                       for i in range(max(0, len(segments) - 1))]
+        return cls(source, fingerprint, segments, transitions, transition_duration)
+
+    def segment_key(self, i: int, encoder: Dict, source_digest: str = None) -> str:
+        return _digest('segment', source_digest or self.fingerprint, self.segments[i], encoder)
+
+    def transition_key(self, i: int, encoder: Dict, source_digest: str = None) -> Optional[str]:
+        # Boundary i sits between segments i and i + 1
+        if self.transitions[i] is None:
+            return None
+        return _digest('transition', self.transitions[i], self.transition_duration,
+                       self.segment_key(i, encoder, source_digest), self.segment_key(i + 1, encoder, source_digest), encoder)
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'source': self.source,
+            'fingerprint': self.fingerprint,
+            'transition_duration': self.transition_duration,
+            'segments': self.segments,
+            'transitions': self.transitions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EditDecisionList":
+        if data.get('version') != EDL_VERSION:
+            raise ValueError(f"Unsupported EDL version {data.get('version')} (expected {EDL_VERSION})")
+        return cls(data['source'], data['fingerprint'], data['segments'], data['transitions'],
+                   data.get('transition_duration', 1.0), data['version'])
+
+    def save(self, path: str):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EditDecisionList":
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
@@ -1,5 +1,9 @@
 from moviepy.editor import VideoFileClip, CompositeVideoClip, vfx
 import numpy as np
+from effects.kernels import FusedKernel, fuse_effects
+from effects.warps import crop_table, resize_clip, rotate_table, scroll_table, warp_clip, zoom_table
+from profiling.tracer import TRACER
+from render.profiles import write_kwargs
 
 class VideoEffects:
     @staticmethod
@@ -7,7 +11,7 @@ class VideoEffects:
         effect_method = getattr(VideoEffects, effect_name, None)
         if not effect_method:
             raise ValueError(f"Unknown effect: {effect_name}")
-        return effect_method(clip, **kwargs)
+        return TRACER.sample_frames(effect_method(clip, **kwargs), f"effect.{effect_name}")
 
     @staticmethod
     def fadein(clip, duration=1):
@@ -19,35 +23,38 @@ class VideoEffects:
 
     @staticmethod
     def invert_colors(clip):
-        return clip.fx(vfx.invert_colors)
+        return FusedKernel([("invert_colors", {})]).apply(clip)
 
     @staticmethod
     def colorx(clip, factor=1.5):
-        return clip.fx(vfx.colorx, factor)
+        return FusedKernel([("colorx", {"factor": factor})]).apply(clip)
 
     @staticmethod
     def lum_contrast(clip, lum=0, contrast=0.5):
-        return clip.fx(vfx.lum_contrast, lum, contrast)
+        return FusedKernel([("lum_contrast", {"lum": lum, "contrast": contrast})]).apply(clip)
 
     @staticmethod
     def brightness(clip, factor=1.2):
-        return clip.fx(vfx.colorx, factor)
+        return FusedKernel([("brightness", {"factor": factor})]).apply(clip)
 
     @staticmethod
     def blackwhite(clip):
-        return clip.fx(vfx.blackwhite)
+        return FusedKernel([("blackwhite", {})]).apply(clip)
 
     @staticmethod
     def rotate(clip, angle=45):
-        return clip.fx(vfx.rotate, angle)
+        # Same frame size, corners black; the remap table is shared by every clip of this size and angle
+        table = rotate_table(clip.size, angle)
+        return warp_clip(clip, "rotate", lambda t: table)
 
     @staticmethod
     def resize(clip, new_size=(640, 480)):
-        return clip.resize(new_size)
+        return resize_clip(clip, new_size)
 
     @staticmethod
     def scroll(clip, speed=10):
-        return clip.fx(vfx.scroll, y_speed=speed)
+        # Content moves up speed pixels a second, wrapping around
+        return warp_clip(clip, "scroll", lambda t: scroll_table(clip.size, speed * t))
 
     @staticmethod
     def crop(clip, x1=0, x2=640, y1=0, y2=480):
@@ -75,7 +82,11 @@ class VideoEffects:
 
     @staticmethod
     def crop_center(clip, x_center=0.5, y_center=0.5, width=640, height=480):
-        return clip.fx(vfx.crop, x_center=x_center, y_center=y_center, width=width, height=height)
+        # Centres up to 1 are fractions of the frame, larger ones pixels
+        w, h = clip.size
+        center = (x_center * w if x_center <= 1 else x_center, y_center * h if y_center <= 1 else y_center)
+        table = crop_table(clip.size, center, (width, height))
+        return warp_clip(clip, "crop_center", lambda t: table)
 
     @staticmethod
     def add_text(clip, text="Sample Text"):
@@ -91,7 +102,7 @@ class VideoEffects:
 
     @staticmethod
     def color_filter(clip, factor=0.5):
-        return clip.fx(vfx.colorx, factor)
+        return FusedKernel([("color_filter", {"factor": factor})]).apply(clip)
 
     @staticmethod
     def clip_speed(clip, factor=1):
@@ -99,7 +110,8 @@ class VideoEffects:
 
     @staticmethod
     def resize_aspect_ratio(clip, width=640):
-        return clip.resize(width=width)
+        w, h = clip.size
+        return VideoEffects.resize(clip, (width, max(1, round(h * width / w))))
 
     @staticmethod
     def edge_detection(clip):
@@ -108,19 +120,24 @@ class VideoEffects:
 
     @staticmethod
     def zoom(clip):
-        return clip.fx(vfx.resize, lambda t: 1 + 0.1 * t)
+        # Zooms in about the centre at the clip's own size; nearby frames share a quantised zoom table
+        return warp_clip(clip, "zoom", lambda t: zoom_table(clip.size, 1 + 0.1 * t))
 
     @staticmethod
     def saturation(clip, factor=1.5):
-        return clip.fx(vfx.colorx, factor)
+        return FusedKernel([("saturation", {"factor": factor})]).apply(clip)
 
     @staticmethod
-    def apply_effects_to_clip(input_path, output_path, effects):
+    def apply_effects_to_clip(input_path, output_path, effects, profile="final"):
         clip = VideoFileClip(input_path)
         
-        for effect in effects:
+        # Runs of pixel-wise effects become one fused kernel pass per frame
+        for effect in fuse_effects(effects):
+            if "kernel" in effect:
+                clip = effect["kernel"].apply(clip)
+                continue
             effect_name = effect.get("name")
             kwargs = effect.get("kwargs", {})
             clip = VideoEffects.apply_effect(clip, effect_name, **kwargs)
         
-        clip.write_videofile(output_path, codec="libx264")
+        clip.write_videofile(output_path, **write_kwargs(profile))
@@ -0,0 +1,149 @@
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+
+from profiling.tracer import TRACER
+
+# Pixel-wise effects as affine colour transforms: out = M @ rgb + b, same defaults as VideoEffects
+PIXEL_EFFECTS = {
+    'colorx': lambda factor=1.5: (np.eye(3) * factor, np.zeros(3)),
+    'brightness': lambda factor=1.2: (np.eye(3) * factor, np.zeros(3)),
+    'saturation': lambda factor=1.5: (np.eye(3) * factor, np.zeros(3)),
+    'color_filter': lambda factor=0.5: (np.eye(3) * factor, np.zeros(3)),
+    'lum_contrast': lambda lum=0, contrast=0.5, contrast_thr=127: (
+        np.eye(3) * (1 + contrast), np.full(3, lum - contrast * contrast_thr, dtype=float)),
+    'invert_colors': lambda: (-np.eye(3), np.full(3, 255.0)),
+    'blackwhite': lambda: (np.full((3, 3), 1 / 3), np.zeros(3)),
+}
+
+
+def is_pixel_effect(name: str) -> bool:
+    return name in PIXEL_EFFECTS
+
+
+def _output_range(M: np.ndarray, b: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    low = b + np.minimum(M * lo, M * hi).sum(axis=1)
+    high = b + np.maximum(M * lo, M * hi).sum(axis=1)
+    return low, high
+
+
+class FusedKernel:
+    """Runs a chain of pixel-wise effects as one pass per frame over preallocated buffers.
+
+    Consecutive effects are folded into a single colour matrix; a clamp (and a new stage) is only
+    emitted where values could actually leave 0..255, which is where moviepy would clip. Unlike
+    chained moviepy effects, intermediate results are not truncated to uint8, so outputs can
+    differ by at most one level per chained effect.
+    """
+
+    def __init__(self, effects: List[Tuple[str, Dict]], tile_bytes: int = 256 * 1024):
+        self.effects = effects
+        self.tile_bytes = tile_bytes
+        self.stages = []
+        M, b = np.eye(3), np.zeros(3)
+        lo, hi = np.zeros(3), np.full(3, 255.0)
+        for name, kwargs in effects:
+            M_op, b_op = PIXEL_EFFECTS[name](**kwargs)
+            M, b = M_op @ M, M_op @ b + b_op
+            low, high = _output_range(M, b, lo, hi)
+            if (low < 0).any() or (high > 255).any():
+                self.stages.append(self._stage(M, b, clamp=True))
+                M, b = np.eye(3), np.zeros(3)
+                lo, hi = np.clip(low, 0, 255), np.clip(high, 0, 255)
+        if not np.allclose(M, np.eye(3)) or b.any():
+            self.stages.append(self._stage(M, b, clamp=False))
+        self._buffers = {}
+        self._outputs = {}
+        self.integer_offset = None
+        if len(self.stages) == 1 and self.stages[0]['matrix'] is None and not self.stages[0]['clamp']:
+            stage = self.stages[0]
+            offset = stage['offset'] if stage['offset'] is not None else np.zeros(3)
+            if (stage['scale'] == -1).all() and (offset == offset[0]).all() and offset[0] == int(offset[0]):
+                self.integer_offset = int(offset[0])
+
+    @staticmethod
+    def _stage(M: np.ndarray, b: np.ndarray, clamp: bool) -> Dict:
+        diagonal = np.allclose(M, np.diag(np.diag(M)))
+        return {
+            'scale': np.diag(M).astype(np.float32) if diagonal else None,
+            'matrix': None if diagonal else M.T.astype(np.float32),
+            'offset': b.astype(np.float32) if b.any() else None,
+            'clamp': clamp,
+        }
+
+    def _buffers_for(self, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        if width not in self._buffers:
+            rows = max(1, self.tile_bytes // (width * 3 * 4))
+            self._buffers[width] = (np.empty((rows, width, 3), np.float32), np.empty((rows, width, 3), np.float32))
+        return self._buffers[width]
+
+    def _process_rows(self, rows: np.ndarray, out: np.ndarray, buf: np.ndarray, spare: np.ndarray):
+        np.copyto(buf, rows)
+        for stage in self.stages:
+            if stage['matrix'] is not None:
+                np.matmul(buf, stage['matrix'], out=spare)
+                buf, spare = spare, buf
+            elif (stage['scale'] != 1).any():
+                np.multiply(buf, stage['scale'], out=buf)
+            if stage['offset'] is not None:
+                np.add(buf, stage['offset'], out=buf)
+            if stage['clamp']:
+                np.clip(buf, 0, 255, out=buf)
+        np.copyto(out, buf, casting='unsafe')
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        # Accepts one (H, W, 3) frame or a batch (N, H, W, 3); the result is a reused buffer.
+        # Work goes through cache-sized row tiles so the float32 intermediates never hit main memory.
+        if frames.shape not in self._outputs:
+            self._outputs[frames.shape] = np.empty(frames.shape, np.uint8)
+        out = self._outputs[frames.shape]
+        if self.integer_offset is not None and frames.dtype == np.uint8:
+            # Inversion and the like stay in uint8: out = offset - frame; other dtypes take the float path
+            np.subtract(np.uint8(self.integer_offset), frames, out=out)
+            return out
+        width = frames.shape[-2]
+        rows_in = frames.reshape(-1, width, 3)
+        rows_out = out.reshape(-1, width, 3)
+        buf, spare = self._buffers_for(width)
+        step = len(buf)
+        for start in range(0, len(rows_in), step):
+            stop = min(start + step, len(rows_in))
+            n = stop - start
+            self._process_rows(rows_in[start:stop], rows_out[start:stop], buf[:n], spare[:n])
+        return out
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        return self.process(frame)
+
+    def apply(self, clip):
+        # Frames come back in the kernel's own buffer; this kernel belongs to one clip, so nothing else writes it
+        return clip.fl_image(TRACER.frame_hook(f"kernel.{'+'.join(name for name, _ in self.effects)}", self))
+
+    def iter_batches(self, clip, batch_size: int = 8, fps: float = None) -> Iterator[np.ndarray]:
+        batch = None
+        n = 0
+        for frame in clip.iter_frames(fps=fps, dtype='uint8'):
+            if batch is None:
+                batch = np.empty((batch_size,) + frame.shape, np.uint8)
+            batch[n] = frame
+            n += 1
+            if n == batch_size:
+                yield self.process(batch)
+                n = 0
+        if n:
+            yield self.process(batch[:n])
+
+
+def fuse_effects(effects: List[Dict]) -> List[Dict]:
+    # Collapses runs of consecutive pixel-wise effects into {"kernel": FusedKernel} entries
+    fused, run = [], []
+    for effect in effects:
+        if is_pixel_effect(effect.get("name")):
+            run.append((effect["name"], effect.get("kwargs", {})))
+            continue
+        if run:
+            fused.append({"kernel": FusedKernel(run)})
+            run = []
+        fused.append(effect)
+    if run:
+        fused.append({"kernel": FusedKernel(run)})
+    return fused
@@ -0,0 +1,337 @@
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from config import WARP_CACHE_BYTES, WARP_INTERPOLATION
+from profiling.tracer import TRACER
+from render.cache import ByteLRU
+
+SCALE_STEP = 1 / 1000  # Zoom factors are quantised so nearby frames, and other segments, share a table
+ANGLE_STEP = 0.25  # Degrees
+TILE_PIXELS = 64 * 1024  # Output pixels per pass, so the uint16 intermediates stay in cache
+
+
+def _quantise_weights(weights: np.ndarray) -> np.ndarray:
+    # Per output pixel (columns), 8-bit weights summing to exactly 256; the rounding error goes to the largest tap
+    q = np.round(weights * 256).astype(np.int32)
+    largest = weights.argmax(axis=0)
+    q[largest, np.arange(q.shape[1])] += 256 - q.sum(axis=0)
+    return q.astype(np.uint16)
+
+
+def _axis_map(n_out: int, n_in: int, scale: float, center: float, bilinear: bool, wrap: bool = False) -> Dict:
+    """Where each output pixel along one axis samples the source: a slice when that is a plain window, gather indices
+    for nearest, otherwise k taps per output pixel with 8-bit weights.
+
+    Upscales and zooms interpolate between the two nearest source pixels. Downscales average every source pixel the
+    output pixel covers, weighted by overlap (an area filter), since two taps would skip most of the source and alias.
+    """
+    if bilinear and scale < 1:
+        # Output pixel i covers source [lo, lo + 1 / scale); source pixel j covers [j, j + 1)
+        lo = (np.arange(n_out) - n_out / 2) / scale + center
+        taps = int(math.ceil(1 / scale)) + 1
+        index = np.floor(lo).astype(np.intp)[None, :] + np.arange(taps)[:, None]
+        overlap = np.minimum(lo + 1 / scale, index + 1) - np.maximum(lo, index)
+        weights = np.clip(overlap, 0, None) * scale
+    elif bilinear:
+        src = (np.arange(n_out) + 0.5 - n_out / 2) / scale + center - 0.5
+        first = np.floor(src).astype(np.intp)
+        index = np.stack([first, first + 1])
+        weights = np.stack([1 - (src - first), src - first])
+    else:
+        src = (np.arange(n_out) + 0.5 - n_out / 2) / scale + center - 0.5
+        index = np.floor(src + 0.5).astype(np.intp)[None, :]
+        weights = np.ones((1, n_out))
+    weight = _quantise_weights(weights)
+    if wrap:
+        index %= n_in
+    else:
+        np.clip(index, 0, n_in - 1, out=index)
+    # Taps that carry no weight anywhere are dropped, so an integer offset becomes a plain gather or slice
+    keep = weight.any(axis=1)
+    index, weight = index[keep], weight[keep]
+    if len(index) == 1:
+        first = index[0]
+        if n_out == 1 or (np.diff(first) == 1).all():
+            return {'slice': slice(int(first[0]), int(first[0]) + n_out)}
+        return {'first': first}
+    return {'index': index, 'weight': weight}
+
+
+def _axis_bytes(axis: Dict) -> int:
+    return sum(a.nbytes for a in axis.values() if isinstance(a, np.ndarray))
+
+
+class SeparableWarp:
+    """Axis-aligned scale and offset (zoom, resize, crop, scroll): one row map and one column map.
+
+    Rows are resampled first, then columns, so each pass gathers whole rows or a fixed column pattern; an axis that is
+    a plain window is sliced rather than gathered.
+    """
+
+    def __init__(self, size_in: Tuple[int, int], size_out: Tuple[int, int], rows: Dict, cols: Dict):
+        self.size_in = size_in
+        self.size_out = size_out
+        self.rows = rows
+        if 'weight' in cols:
+            # Repeated per channel: broadcasting an (n, 1) operand across the channel axis is several times slower
+            cols = dict(cols, weight=np.repeat(cols['weight'][:, :, None], 3, axis=2))
+        self.cols = cols
+        self.nbytes = _axis_bytes(rows) + _axis_bytes(cols)
+
+    def apply(self, frame: np.ndarray, out: np.ndarray, work: Dict) -> np.ndarray:
+        (w_in, _), (_, h_out) = self.size_in, self.size_out
+        rows, cols = self.rows, self.cols
+        if 'slice' in rows:
+            tall = frame[rows['slice']]
+        else:
+            tall = work.setdefault(('rows', h_out, w_in), np.empty((h_out, w_in, 3), np.uint8))
+            if 'weight' not in rows:
+                np.take(frame, rows['first'], axis=0, out=tall)
+            else:
+                self._filter_rows(frame, tall, work)
+        if 'slice' in cols:
+            np.copyto(out, tall[:, cols['slice']])
+        elif 'weight' not in cols:
+            np.take(tall, cols['first'], axis=1, out=out)
+        else:
+            self._filter_cols(tall, out, work)
+        return out
+
+    def _scratch(self, work: Dict, shape: Tuple[int, ...]) -> Tuple[np.ndarray, ...]:
+        key = ('scratch', shape)
+        if key not in work:
+            work[key] = (np.empty(shape, np.uint8), np.empty(shape, np.uint16), np.empty(shape, np.uint16))
+        return work[key]
+
+    @staticmethod
+    def _weighted_sum(gather: Callable[[int, np.ndarray], None], weights, out: np.ndarray, pixels: np.ndarray,
+                      acc: np.ndarray, tmp: np.ndarray):
+        # out = round(sum(tap_k * w_k) / 256); weights sum to 256, so the sum stays within uint16
+        for k, weight in enumerate(weights):
+            gather(k, pixels)
+            np.multiply(pixels, weight, out=acc if k == 0 else tmp)
+            if k:
+                acc += tmp
+        acc += 128
+        acc >>= 8
+        np.copyto(out, acc, casting='unsafe')
+
+    def _filter_rows(self, frame: np.ndarray, out: np.ndarray, work: Dict):
+        rows, width = self.rows, frame.shape[1]
+        step = max(1, TILE_PIXELS // width)
+        pixels, acc, tmp = self._scratch(work, (step, width, 3))
+        for start in range(0, len(out), step):
+            stop = min(start + step, len(out))
+            n = stop - start
+            self._weighted_sum(lambda k, p: np.take(frame, rows['index'][k, start:stop], axis=0, out=p),
+                               rows['weight'][:, start:stop, None, None], out[start:stop], pixels[:n], acc[:n], tmp[:n])
+
+    def _filter_cols(self, frame: np.ndarray, out: np.ndarray, work: Dict):
+        cols, width = self.cols, out.shape[1]
+        step = max(1, TILE_PIXELS // width)
+        pixels, acc, tmp = self._scratch(work, (step, width, 3))
+        for start in range(0, len(out), step):
+            stop = min(start + step, len(out))
+            n = stop - start
+            self._weighted_sum(lambda k, p: np.take(frame[start:stop], cols['index'][k], axis=1, out=p),
+                               cols['weight'], out[start:stop], pixels[:n], acc[:n], tmp[:n])
+
+
+class GridWarp:
+    """A general per-pixel map (rotation): each output pixel samples its own source position.
+
+    The source is copied into a frame with a one-pixel black border, and every output pixel stores the flat index of
+    its top-left neighbour there plus 4-bit subpixel offsets; pixels that fall outside the source point at a border
+    pixel with zero offsets, so they come out black without a separate mask.
+    """
+
+    def __init__(self, size: Tuple[int, int], index: np.ndarray, fx: Optional[np.ndarray], fy: Optional[np.ndarray]):
+        self.size_in = self.size_out = size
+        self.index = index
+        self.fx = fx
+        self.fy = fy
+        self.nbytes = sum(a.nbytes for a in (index, fx, fy) if a is not None)
+
+    def _padded(self, frame: np.ndarray, work: Dict) -> Tuple[np.ndarray, int]:
+        w, h = self.size_in
+        if 'padded' not in work:
+            # A few spare bytes at the end let the last pixel be read as an 8-byte pair
+            work['padded'] = np.zeros(3 * (h + 2) * (w + 2) + 8, np.uint8)
+        padded = work['padded']
+        padded[:3 * (h + 2) * (w + 2)].reshape(h + 2, w + 2, 3)[1:-1, 1:-1] = frame
+        return padded, (h + 2) * (w + 2)
+
+    def apply(self, frame: np.ndarray, out: np.ndarray, work: Dict) -> np.ndarray:
+        padded, count = self._padded(frame, work)
+        flat = out.reshape(-1, 3)
+        if self.fx is None:
+            pixels = np.ndarray((count,), 'V3', buffer=padded)
+            flat.view('V3')[:, 0] = pixels[self.index]
+            return out
+        # Each 8-byte read at a pixel brings its right-hand neighbour along, so two gathers fetch all four neighbours
+        pairs = np.ndarray((count,), np.uint64, buffer=padded, strides=(3,))
+        stride = self.size_in[0] + 2
+        if 'grid' not in work:
+            work['grid'] = ([np.empty(TILE_PIXELS, np.uint16) for _ in range(5)], np.empty(TILE_PIXELS, np.uint16),
+                            np.empty(TILE_PIXELS, np.int32))
+        (*w, t), acc, below = work['grid']
+        for start in range(0, len(flat), TILE_PIXELS):
+            stop = min(start + TILE_PIXELS, len(flat))
+            n = stop - start
+            index = self.index[start:stop]
+            np.add(index, stride, out=below[:n])
+            top = pairs[index].view(np.uint8).reshape(n, 8)
+            bottom = pairs[below[:n]].view(np.uint8).reshape(n, 8)
+            fx, fy = self.fx[start:stop], self.fy[start:stop]
+            # Bilinear weights out of 16 per axis, 256 in total: (16-fx)(16-fy), fx(16-fy), (16-fx)fy, fx*fy
+            np.multiply(fx, fy, out=w[3][:n])
+            np.multiply(fx, 16, out=w[1][:n])
+            w[1][:n] -= w[3][:n]
+            np.multiply(fy, 16, out=w[2][:n])
+            w[2][:n] -= w[3][:n]
+            np.add(w[1][:n], w[2][:n], out=t[:n])
+            t[:n] += w[3][:n]
+            np.subtract(256, t[:n], out=w[0][:n])
+            # One channel at a time: numpy runs 1-D strided loops far faster than (n, 3) arrays against (n, 1) weights
+            for c in range(3):
+                np.multiply(top[:, c], w[0][:n], out=acc[:n])
+                for pixels, weight in ((top[:, c + 3], w[1]), (bottom[:, c], w[2]), (bottom[:, c + 3], w[3])):
+                    np.multiply(pixels, weight[:n], out=t[:n])
+                    acc[:n] += t[:n]
+                acc[:n] += 128
+                acc[:n] >>= 8
+                np.copyto(flat[start:stop, c], acc[:n], casting='unsafe')
+        return out
+
+
+def _rotation(size: Tuple[int, int], angle: float, bilinear: bool) -> GridWarp:
+    # Counterclockwise about the frame centre, same size as the source; corners that leave the frame come out black
+    w, h = size
+    theta = math.radians(angle)
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    x -= (w - 1) / 2
+    y -= (h - 1) / 2
+    # Source position of every output pixel, in the bordered frame's coordinates
+    sx = math.cos(theta) * x - math.sin(theta) * y + (w - 1) / 2 + 1
+    sy = math.sin(theta) * x + math.cos(theta) * y + (h - 1) / 2 + 1
+    if bilinear:
+        # Sixteenths of a pixel: the integer part is the top-left neighbour, the low four bits its offsets
+        qx = np.rint(sx * 16).astype(np.int32)
+        qy = np.rint(sy * 16).astype(np.int32)
+        ix, iy = qx >> 4, qy >> 4
+        inside = (ix >= 0) & (ix <= w) & (iy >= 0) & (iy <= h)
+    else:
+        ix, iy = np.rint(sx).astype(np.int32), np.rint(sy).astype(np.int32)
+        inside = (ix >= 1) & (ix <= w) & (iy >= 1) & (iy <= h)
+    index = iy * (w + 2) + ix
+    index[~inside] = 0
+    if not bilinear:
+        return GridWarp(size, index.ravel(), None, None)
+    fx = (qx & 15).astype(np.uint8)
+    fy = (qy & 15).astype(np.uint8)
+    fx[~inside] = 0
+    fy[~inside] = 0
+    return GridWarp(size, index.ravel(), fx.ravel(), fy.ravel())
+
+
+class WarpCache(ByteLRU):
+    """Remap tables keyed by (transform, resolution, quantised parameters), shared by every clip in the process.
+
+    Tables are kept in a byte-bounded LRU, so a zoom or rotation repeated on other segments, or at the same point
+    of every transition, is built once.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(max_bytes)
+
+    def get(self, key: tuple, build: Callable[[], object]):
+        def traced():
+            with TRACER.span('warp.build', transform=key[0]):
+                return build()
+        return self.get_or_build(key, traced)
+
+
+WARPS = WarpCache(WARP_CACHE_BYTES)
+
+
+def _bilinear(interpolation: Optional[str]) -> bool:
+    interpolation = interpolation or WARP_INTERPOLATION
+    if interpolation not in ('bilinear', 'nearest'):
+        raise ValueError(f"Unknown interpolation: {interpolation}")
+    return interpolation == 'bilinear'
+
+
+def zoom_table(size: Tuple[int, int], scale: float, interpolation: str = None) -> SeparableWarp:
+    # Scaled about the centre and cropped back to the source size
+    w, h = size
+    scale = max(SCALE_STEP, round(scale / SCALE_STEP) * SCALE_STEP)
+    bilinear = _bilinear(interpolation)
+    return WARPS.get(('zoom', w, h, round(scale / SCALE_STEP), bilinear), lambda: SeparableWarp(
+        size, size, _axis_map(h, h, scale, h / 2, bilinear), _axis_map(w, w, scale, w / 2, bilinear)))
+
+
+def resize_table(size: Tuple[int, int], new_size: Tuple[int, int], interpolation: str = None) -> SeparableWarp:
+    (w, h), (new_w, new_h) = size, new_size
+    bilinear = _bilinear(interpolation)
+    return WARPS.get(('resize', w, h, new_w, new_h, bilinear), lambda: SeparableWarp(
+        size, new_size, _axis_map(new_h, h, new_h / h, h / 2, bilinear), _axis_map(new_w, w, new_w / w, w / 2, bilinear)))
+
+
+def crop_table(size: Tuple[int, int], center: Tuple[float, float], crop_size: Tuple[int, int]) -> SeparableWarp:
+    # A whole-pixel window, kept inside the frame
+    (w, h), (crop_w, crop_h) = size, crop_size
+    crop_w, crop_h = min(crop_w, w), min(crop_h, h)
+    x1 = min(max(int(round(center[0] - crop_w / 2)), 0), w - crop_w)
+    y1 = min(max(int(round(center[1] - crop_h / 2)), 0), h - crop_h)
+    return WARPS.get(('crop', w, h, x1, y1, crop_w, crop_h), lambda: SeparableWarp(
+        size, (crop_w, crop_h), {'slice': slice(y1, y1 + crop_h)}, {'slice': slice(x1, x1 + crop_w)}))
+
+
+def scroll_table(size: Tuple[int, int], offset: int) -> SeparableWarp:
+    # Content moves up by offset rows and wraps around at the bottom
+    w, h = size
+    offset = int(offset) % h
+    return WARPS.get(('scroll', w, h, offset), lambda: SeparableWarp(
+        size, size, _axis_map(h, h, 1, h / 2 + offset, False, wrap=True), {'slice': slice(0, w)}))
+
+
+def rotate_table(size: Tuple[int, int], angle: float, interpolation: str = None) -> GridWarp:
+    w, h = size
+    step = round((angle % 360) / ANGLE_STEP) % round(360 / ANGLE_STEP)
+    bilinear = _bilinear(interpolation)
+    return WARPS.get(('rotate', w, h, step, bilinear), lambda: _rotation(size, step * ANGLE_STEP, bilinear))
+
+
+class Warper:
+    """Applies a clip's remap table to every frame, into output buffers allocated once per clip."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._work: Dict = {}
+        self._outputs: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def __call__(self, frame: np.ndarray, table) -> np.ndarray:
+        frame = frame[..., :3]
+        if frame.dtype != np.uint8:
+            frame = frame.astype(np.uint8)
+        w, h = table.size_out
+        if (w, h) not in self._outputs:
+            self._outputs[(w, h)] = np.empty((h, w, 3), np.uint8)
+        return table.apply(frame, self._outputs[(w, h)], self._work)
+
+    def apply(self, clip, table_at: Callable[[float], object]):
+        # warp_clip makes one Warper per clip, so a frame is only overwritten by that clip's next frame;
+        # concatenated or composited warps never share a buffer
+        warp = TRACER.frame_hook(f"warp.{self.name}", self)
+        return clip.fl(lambda gf, t: warp(gf(t), table_at(t)), apply_to=[])
+
+
+def warp_clip(clip, name: str, table_at: Callable[[float], object]):
+    return Warper(name).apply(clip, table_at)
+
+
+def resize_clip(clip, new_size: Tuple[int, int], interpolation: str = None):
+    table = resize_table(tuple(clip.size), tuple(new_size), interpolation)
+    return warp_clip(clip, "resize", lambda t: table)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from llm.cache import ResponseCache
+from llm.context import estimate_tokens
+from profiling.tracer import TRACER
+
+
+def _parse_reset(value: Optional[str]) -> float:
+    # Groq reports resets as "7.66s", "2m59.56s" or "120ms"
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        seconds += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return seconds
+
+
+class TokenBucket:
+    # Reservations are taken synchronously (tokens may go negative), so the bucket is not tied to an event loop;
+    # the lock lets several threads, each running its own loop, share one budget
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+
+    def observe(self, remaining: Optional[str], reset: Optional[str]):
+        if remaining is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            remaining = float(remaining)
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0:
+                self.blocked_until = max(self.blocked_until, now + _parse_reset(reset))
+
+
+class AsyncLLMClient:
+    def __init__(self, api_key: str, model: str, base_url: str, cache: Optional[ResponseCache] = None,
+                 max_concurrency: int = 4, requests_per_minute: float = 30, tokens_per_minute: float = 6000,
+                 max_retries: int = 5, backoff: float = 1.0, timeout: float = 60):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 10))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.slept = 0.0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def _sleep(self, seconds: float):
+        if seconds > 0:
+            self.slept += seconds
+            with TRACER.span('llm.wait', 'wait'):
+                await asyncio.sleep(seconds)
+
+    def _observe(self, headers):
+        self.requests.observe(headers.get('x-ratelimit-remaining-requests'), headers.get('x-ratelimit-reset-requests'))
+        self.tokens.observe(headers.get('x-ratelimit-remaining-tokens'), headers.get('x-ratelimit-reset-tokens'))
+
+    async def _request(self, http: httpx.AsyncClient, messages: List[Dict], params: Dict) -> Optional[str]:
+        payload = dict(params, model=self.model, messages=messages)
+        cost = estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            await self._sleep(max(self.requests.reserve(), self.tokens.reserve(cost)))
+            retry_after = None
+            try:
+                self.calls += 1
+                with TRACER.span('llm.request', 'network', attempt=attempt) as span:
+                    response = await http.post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        timeout=self.timeout,
+                    )
+                    span.set(status=response.status_code)
+                    self._observe(response.headers)
+                    if response.status_code == 200:
+                        body = response.json()
+                        usage = body.get('usage') or {}
+                        span.add(prompt_tokens=usage.get('prompt_tokens', cost),
+                                 completion_tokens=usage.get('completion_tokens', 0))
+                        self.prompt_tokens += usage.get('prompt_tokens', cost)
+                        self.completion_tokens += usage.get('completion_tokens', 0)
+                        return body['choices'][0]['message']['content']
+                if response.status_code != 429 and response.status_code < 500:
+                    logging.error(f"LLM request failed with {response.status_code}: {response.text[:200]}")
+                    return None
+                retry_after = _parse_reset(response.headers.get('retry-after')) or None
+                logging.warning(f"LLM request got {response.status_code}, retrying (attempt {attempt + 1})")
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                logging.warning(f"LLM request error: {e}, retrying (attempt {attempt + 1})")
+            if attempt < self.max_retries:
+                # Full jitter keeps concurrent retries from stampeding the endpoint together
+                delay = retry_after if retry_after is not None else random.uniform(0, self.backoff * 2 ** attempt)
+                await self._sleep(delay)
+        logging.error(f"LLM request failed after {self.max_retries + 1} attempts")
+        return None
+
+    async def _complete(self, http: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                        messages: List[Dict], params: Dict) -> Optional[str]:
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.model, messages, params)
+            cached = self.cache.get(key)
+            TRACER.count('llm_cache.hit' if cached is not None else 'llm_cache.miss')
+            if cached is not None:
+                return cached
+        async with semaphore:
+            result = await self._request(http, messages, params)
+        if result is not None and key is not None:
+            self.cache.put(key, result)
+        return result
+
+    async def complete_many(self, requests: List[List[Dict]], **params) -> List[Optional[str]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with httpx.AsyncClient() as http:
+            return await asyncio.gather(*(self._complete(http, semaphore, messages, params) for messages in requests))
+
+    async def complete(self, messages: List[Dict], **params) -> Optional[str]:
+        return (await self.complete_many([messages], **params))[0]
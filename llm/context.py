@@ -0,0 +1,53 @@
+from typing import Dict, List
+
+SYSTEM_PROMPT = "You need to perform the task given by the user"
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    # ~4 characters per token plus per-message framing; close enough for budgeting llama3 prompts
+    return sum(len(m.get('content') or '') for m in messages) // 4 + 4 * len(messages)
+
+
+class ConversationContext:
+    """Conversation history for one video job, trimmed to a token budget.
+
+    With stateless=True every prompt is sent on its own, which is what one-shot
+    classification prompts (effect and transition picks) want.
+    """
+
+    def __init__(self, token_budget: int = 6000, system_prompt: str = SYSTEM_PROMPT, stateless: bool = False):
+        self.token_budget = token_budget
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.stateless = stateless
+        self.turns: List[List[Dict]] = []
+        self.prompt_tokens: List[int] = []
+
+    def build(self, prompt: str) -> List[Dict]:
+        request = {"role": "system", "content": prompt}
+        if self.stateless:
+            messages = [self.system_message, request]
+        else:
+            # Sliding window: drop the oldest turns until the prompt fits the budget
+            fixed = estimate_tokens([self.system_message, request])
+            kept = []
+            used = fixed
+            for turn in reversed(self.turns):
+                cost = estimate_tokens(turn)
+                if used + cost > self.token_budget:
+                    break
+                kept.insert(0, turn)
+                used += cost
+            messages = [self.system_message] + [m for turn in kept for m in turn] + [request]
+        self.prompt_tokens.append(estimate_tokens(messages))
+        return messages
+
+    def record(self, prompt: str, response: str):
+        if not self.stateless:
+            self.turns.append([{"role": "system", "content": prompt}, {"role": "assistant", "content": response}])
+
+    def stats(self) -> Dict:
+        return {
+            'calls': len(self.prompt_tokens),
+            'prompt_tokens': sum(self.prompt_tokens),
+            'max_prompt_tokens': max(self.prompt_tokens, default=0),
+        }
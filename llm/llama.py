@@ -1,42 +1,33 @@
-from groq import Groq
-import time
-from config import GROK_API_KEY
-client = Groq(
-# This is the default and can be omitted
-api_key=GROK_API_KEY,
-)
-
-messages = {
-    "role": "system",
-    "content": "You need to perform the task given by the user"
-    }
-
-cache = {}
+import asyncio
+from config import (GROK_API_KEY, LLM_MODEL, LLM_BASE_URL, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES,
+                    LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES)
+from llm.cache import ResponseCache
+from llm.client import AsyncLLMClient
+from llm.context import ConversationContext
 
-def LLM(prompt):
-    global messages
-    if prompt in cache:
-        return cache[prompt]
-    
-    time.sleep(5)
-    
-    # Append user message to messages list
-    messages.append({"role": "system", "content": prompt})
+cache = ResponseCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
 
-    # Create client and get response
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=messages,
-            model="llama3-70b-8192"
-        )
-        # Extract assistant message from response
-        ms = chat_completion.choices[0].message.content
-
-        # Append assistant message to messages list
-        messages.append({"role": "assistant", "content": ms})
+client = AsyncLLMClient(
+    api_key=GROK_API_KEY,
+    model=LLM_MODEL,
+    base_url=LLM_BASE_URL,
+    cache=cache,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_retries=LLM_MAX_RETRIES,
+)
 
-        cache[prompt] = ms
-        return ms
-    except Exception as e:
-        print(f"An error occurred: {e}")
+def LLM(prompt, context: ConversationContext = None):
+    # Without a context the prompt is sent on its own, with no history
+    context = context or ConversationContext(stateless=True)
+    ms = asyncio.run(client.complete(context.build(prompt)))
+    if ms is None:
         return None
+    context.record(prompt, ms)
+    return ms
+
+def LLM_batch(prompts, context: ConversationContext = None):
+    # Independent one-shot prompts, sent concurrently under the client's rate limits
+    context = context or ConversationContext(stateless=True)
+    return asyncio.run(client.complete_many([context.build(prompt) for prompt in prompts]))
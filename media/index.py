@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from fractions import Fraction
+from typing import Dict, List, Optional
+
+import moviepy.editor as mp
+from moviepy.config import get_setting
+from moviepy.compat import DEVNULL
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+
+from config import FFPROBE_BINARY, SEEK_INDEX_DIR, SEEK_INDEX_SUFFIX
+from profiling.tracer import TRACER
+
+INDEX_VERSION = 1
+
+_loaded: Dict[tuple, "SeekIndex"] = {}
+_lock = threading.Lock()
+
+
+class SeekIndex:
+    """Keyframe timestamps and byte offsets, frame count and time base of a source's first video stream.
+
+    Built in one ffprobe demux pass (packet headers only, nothing is decoded) and cached as JSON next to the source,
+    keyed on its size and mtime. Times are seconds from the start of the file, the clock moviepy's subclip and
+    ffmpeg's -ss use.
+    """
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self.keyframes: List[float] = data['keyframes']
+        self.offsets: List[int] = data['offsets']
+        self.frame_count: int = data['frame_count']
+        self.time_base: str = data['time_base']
+        self.fps: float = data['fps']
+        self.duration: float = data['duration']
+
+    @classmethod
+    def build(cls, path: str) -> "SeekIndex":
+        out = subprocess.run([FFPROBE_BINARY, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                              'format=start_time,duration:stream=time_base,avg_frame_rate,r_frame_rate:packet=pts,dts,pos,flags',
+                              '-of', 'compact', path], capture_output=True, check=True, text=True).stdout
+        stream, start_time, duration, packets = {}, 0.0, 0.0, []
+        for line in out.splitlines():
+            section, _, rest = line.partition('|')
+            fields = dict(field.split('=', 1) for field in rest.split('|') if '=' in field)
+            if section == 'packet':
+                packets.append(fields)
+            elif section == 'stream':
+                stream = fields
+            elif section == 'format':
+                start_time = _float(fields.get('start_time')) or 0.0
+                duration = _float(fields.get('duration')) or 0.0
+        if not stream:
+            raise ValueError(f"{path} has no video stream")
+        time_base = Fraction(stream['time_base'])
+        rates = [Fraction(r) for r in (stream.get('avg_frame_rate'), stream.get('r_frame_rate')) if r and not r.endswith('/0')]
+        keyframes = []
+        for packet in packets:
+            if 'K' not in packet.get('flags', ''):
+                continue
+            ts = packet.get('pts') if packet.get('pts') not in (None, 'N/A') else packet.get('dts')
+            if ts in (None, 'N/A'):
+                continue
+            pos = packet.get('pos')
+            keyframes.append((round(float(int(ts) * time_base) - start_time, 6), int(pos) if pos not in (None, 'N/A') else -1))
+        keyframes.sort()
+        return cls({
+            'version': INDEX_VERSION,
+            'keyframes': [t for t, _ in keyframes],
+            'offsets': [pos for _, pos in keyframes],
+            'frame_count': len(packets),
+            'time_base': str(time_base),
+            'fps': float(next((r for r in rates if r), 0)),
+            'duration': duration,
+        })
+
+    def keyframe_before(self, t: float) -> float:
+        # The keyframe decoding has to start from to produce the frame at t
+        i = bisect_right(self.keyframes, t + 1e-6) - 1
+        return self.keyframes[i] if i >= 0 else 0.0
+
+    def keyframe_after(self, t: float) -> Optional[float]:
+        i = bisect_left(self.keyframes, t - 1e-6)
+        return self.keyframes[i] if i < len(self.keyframes) else None
+
+    def snap(self, t: float, tolerance: float) -> float:
+        # The nearest keyframe within tolerance seconds of t, or t itself
+        candidates = [k for k in (self.keyframe_before(t), self.keyframe_after(t)) if k is not None and abs(k - t) <= tolerance]
+        return min(candidates, key=lambda k: abs(k - t)) if candidates else t
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def index_paths(path: str) -> List[str]:
+    # Next to the source first; a shared cache directory for sources in read-only places
+    name = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return [path + SEEK_INDEX_SUFFIX, os.path.join(SEEK_INDEX_DIR, f"{os.path.basename(path)}.{name}{SEEK_INDEX_SUFFIX}")]
+
+
+def load_index(path: str) -> SeekIndex:
+    """The seek index of a source: memoised per process, read from its cache file, or built and cached."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    candidates = index_paths(path)
+    index = None
+    for candidate in candidates:
+        try:
+            with open(candidate) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get('version') == INDEX_VERSION and data.get('source') == source:
+            index = SeekIndex(data)
+            TRACER.count('seek_index.hit')
+            break
+    if index is None:
+        TRACER.count('seek_index.miss')
+        started = time.perf_counter()
+        with TRACER.span('index.build', source=path) as span:
+            index = SeekIndex.build(path)
+            span.add(frames=index.frame_count)
+        index.data['source'] = source
+        for candidate in candidates:
+            try:
+                _write_atomic(candidate, index.data)
+                break
+            except OSError:
+                continue
+        logging.info(f"Indexed {path} in {time.perf_counter() - started:.2f}s: {index.frame_count} frames, "
+                     f"{len(index.keyframes)} keyframes, time base {index.time_base}")
+    with _lock:
+        _loaded[key] = index
+    return index
+
+
+def _write_atomic(path: str, data: Dict):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class IndexedVideoReader(FFMPEG_VideoReader):
+    """moviepy's ffmpeg frame reader, seeking by the source's keyframes.
+
+    moviepy restarts ffmpeg on any jump back or more than 100 frames ahead, at a second before the target, which often
+    lands a whole GOP early. This reader restarts only when a keyframe lies between the frame it last read and the
+    target, and then starts decoding at that keyframe; anything closer is read on from the running process.
+    """
+
+    def __init__(self, reader: FFMPEG_VideoReader, index: SeekIndex):
+        # Takes over an open reader, running ffmpeg process included, rather than starting another one at frame 0
+        self.__dict__.update(reader.__dict__)
+        reader.proc = None
+        self.index = index
+
+    def initialize(self, starttime=0):
+        self.close()
+        # An input seek demuxes from the keyframe before the target and drops the frames ahead of it before they are
+        # scaled. It starts at the frame sequential reading returns for starttime (the last one at or before it), so the
+        # frame at t doesn't depend on how the reader got there; the cut sits a quarter frame early because half a frame
+        # or more makes ffmpeg's constant-rate output repeat the first frame, shifting every frame read after it
+        frame = int(self.fps * starttime + 0.00001)
+        if frame:
+            i_arg = ['-ss', f"{(frame - 0.25) / self.fps:.6f}", '-i', self.filename]
+        else:
+            i_arg = ['-i', self.filename]
+        cmd = ([get_setting("FFMPEG_BINARY")] + i_arg +
+               ['-loglevel', 'error', '-f', 'image2pipe', '-vf', 'scale=%d:%d' % tuple(self.size),
+                '-sws_flags', self.resize_algo, '-pix_fmt', self.pix_fmt, '-vcodec', 'rawvideo', '-'])
+        popen_params = {'bufsize': self.bufsize, 'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE, 'stdin': DEVNULL}
+        if os.name == 'nt':
+            popen_params['creationflags'] = 0x08000000
+        self.proc = subprocess.Popen(cmd, **popen_params)
+        TRACER.count('seek_index.seeks')
+
+    def get_frame(self, t):
+        pos = int(self.fps * t + 0.00001) + 1
+        if self.proc and pos == self.pos:
+            return self.lastread
+        # self.pos is the 1-based number of the frame last read, so frame self.pos (0-based) is the next one in the pipe;
+        # restarting pays off once decoding can begin at a keyframe past it
+        if not self.proc or pos < self.pos or self.index.keyframe_before(t) > (self.pos + 0.5) / self.fps:
+            self.initialize(t)
+        else:
+            self.skip_frames(pos - self.pos - 1)
+        self.lastread = self.read_frame()
+        self.pos = pos
+        return self.lastread
+
+
+def open_indexed(path: str, **kwargs) -> mp.VideoFileClip:
+    """A VideoFileClip whose frames are read through the source's seek index, or a plain one if it can't be built."""
+    clip = mp.VideoFileClip(path, **kwargs)
+    try:
+        index = load_index(path)
+    except Exception as e:
+        logging.warning(f"Could not index {path} ({e}); seeking without it")
+        return clip
+    clip.reader = IndexedVideoReader(clip.reader, index)
+    return clip
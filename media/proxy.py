@@ -0,0 +1,40 @@
+import hashlib
+import logging
+import os
+import subprocess
+import time
+
+from moviepy.config import get_setting
+
+from profiling.tracer import TRACER
+from render.profiles import ffmpeg_args
+
+
+def proxy_path(path: str, height: int, fps: float, cache_dir: str) -> str:
+    # Keyed on the source's identity and the proxy settings, so an edited source or new settings get a fresh proxy
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{height}|{fps}|{' '.join(ffmpeg_args('proxy'))}"
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}_{height}p{fps:g}_{hashlib.sha256(key.encode()).hexdigest()[:16]}.mp4")
+
+
+def ensure_proxy(path: str, height: int = 360, fps: float = 12, cache_dir: str = 'cache/proxies') -> str:
+    """Low-resolution, low-frame-rate copy of a source, with short GOPs, for preview renders.
+
+    The proxy keeps the source's duration and audio, so every timestamp in an edit plan applies to both.
+    Sources already shorter than height are never upscaled.
+    """
+    output = proxy_path(path, height, fps, cache_dir)
+    if os.path.exists(output):
+        return output
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{output}.{os.getpid()}.tmp.mp4"
+    started = time.perf_counter()
+    with TRACER.span('proxy', source=path) as span:
+        subprocess.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-i', path,
+                        '-vf', f"scale=-2:'trunc(min({height}\\,ih)/2)*2',fps={fps:g}"] + ffmpeg_args('proxy') + [tmp],
+                       check=True)
+        span.add(bytes_read=os.path.getsize(path), bytes_written=os.path.getsize(tmp))
+    os.replace(tmp, output)
+    logging.info(f"Built {height}p/{fps:g}fps proxy of {path} in {time.perf_counter() - started:.1f}s: {output}")
+    return output
@@ -0,0 +1,66 @@
+import logging
+import numpy as np
+import moviepy.editor as mp
+import speech_recognition as sr
+from typing import Iterator, Optional, Tuple
+
+
+class MediaSource:
+    def __init__(self, path: str, sample_rate: int = 16000, sample_width: int = 2):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._video: Optional[mp.VideoFileClip] = None
+
+    @property
+    def video(self) -> mp.VideoFileClip:
+        if self._video is None:
+            self._video = mp.VideoFileClip(self.path)
+            logging.info(f"Opened {self.path} ({self._video.duration:.1f}s, {self._video.size[0]}x{self._video.size[1]})")
+        return self._video
+
+    @property
+    def duration(self) -> float:
+        return self.video.duration
+
+    @property
+    def has_audio(self) -> bool:
+        return self.video.audio is not None
+
+    def iter_pcm_chunks(self, chunk_duration: float = 50.0) -> Iterator[Tuple[float, bytes]]:
+        # Yields (offset_seconds, mono little-endian PCM) straight from the decoder, no WAV on disk.
+        audio = self.video.audio
+        if audio is None:
+            return
+        scale = 2 ** (8 * self.sample_width - 1)
+        dtype = {1: '<i1', 2: '<i2', 4: '<i4'}[self.sample_width]
+        total = int(self.sample_rate * audio.duration)
+        chunk_size = max(1, int(chunk_duration * self.sample_rate))
+        # moviepy's audio reader only buffers a few seconds, so read each chunk in 1s blocks
+        block = self.sample_rate
+        for start in range(0, total, chunk_size):
+            stop = min(start + chunk_size, total)
+            blocks = []
+            for b in range(start, stop, block):
+                tt = np.arange(b, min(b + block, stop)) / self.sample_rate
+                samples = audio.to_soundarray(tt, fps=self.sample_rate)
+                if samples.ndim == 2:
+                    samples = samples.mean(axis=1)
+                blocks.append(samples)
+            pcm = (np.clip(np.concatenate(blocks), -0.99, 0.99) * scale).astype(dtype)
+            yield start / self.sample_rate, pcm.tobytes()
+
+    def iter_audio_data(self, chunk_duration: float = 50.0) -> Iterator[Tuple[float, sr.AudioData]]:
+        for offset, pcm in self.iter_pcm_chunks(chunk_duration):
+            yield offset, sr.AudioData(pcm, self.sample_rate, self.sample_width)
+
+    def close(self):
+        if self._video is not None:
+            self._video.close()
+            self._video = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,198 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import TRACE_FRAME_SAMPLE_EVERY
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('id', 'parent', 'name', 'category', 'start', 'duration', 'pid', 'tid', 'attrs', 'counts')
+
+    def __init__(self, span_id: str, parent: Optional[str], name: str, category: str, attrs: Dict):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.start = time.time()
+        self.duration = 0.0
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.attrs = attrs
+        self.counts = {}
+
+    def add(self, **counts):
+        # Counters (frames, bytes_read, bytes_written, tokens...) are summed per stage; attrs are only labels
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'parent': self.parent, 'name': self.name, 'category': self.category,
+                'start': self.start, 'duration': self.duration, 'pid': self.pid, 'tid': self.tid,
+                'attrs': self.attrs, 'counts': self.counts}
+
+
+class Tracer:
+    """Collects timing spans for the pipeline's stages, exportable as JSON or as a Chrome trace.
+
+    Spans nest through a context variable, so nesting follows threads and asyncio tasks; thread pools don't carry
+    it over, so work submitted to a pool is wrapped with bind(). Worker processes record into their own tracer and
+    ship their spans back with drain()/merge(). Frame sampling is opt-in: with frame_sample_every = N, every Nth
+    call of a hooked effect or transition kernel is recorded as a 'frame' span; with 0 the hooks are not installed.
+    """
+
+    def __init__(self, frame_sample_every: int = 0):
+        self.frame_sample_every = frame_sample_every
+        self._spans: List[Dict] = []
+        self._counters: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'stage', **attrs):
+        parent = _current.get()
+        span = Span(f"{os.getpid()}:{next(self._ids)}", parent.id if parent else None, name, category, attrs)
+        token = _current.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current.reset(token)
+            with self._lock:
+                self._spans.append(span.to_dict())
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def add(self, **counts):
+        # Counts against the innermost open span, if any
+        span = _current.get()
+        if span is not None:
+            span.add(**counts)
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def bind(self, fn: Callable) -> Callable:
+        parent = _current.get()
+
+        def bound(*args, **kwargs):
+            token = _current.set(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+        return bound
+
+    def frame_hook(self, name: str, fn: Callable) -> Callable:
+        every = self.frame_sample_every
+        if not every:
+            return fn
+        calls = itertools.count()
+
+        def sampled(*args):
+            if next(calls) % every:
+                return fn(*args)
+            with self.span(name, 'frame'):
+                return fn(*args)
+        return sampled
+
+    def sample_frames(self, clip, name: str):
+        # Times the clip's whole frame function, upstream decoding and effects included
+        if not self.frame_sample_every:
+            return clip
+        get_frame = self.frame_hook(name, lambda gf, t: gf(t))
+        return clip.fl(get_frame)
+
+    def drain(self) -> Dict:
+        with self._lock:
+            spans, counters = self._spans, self._counters
+            self._spans, self._counters = [], {}
+        return {'spans': spans, 'counters': counters}
+
+    def merge(self, recorded: Dict):
+        # Top-level spans from a worker process hang under the span that was open when it was merged
+        parent = _current.get()
+        with self._lock:
+            for span in recorded['spans']:
+                if span['parent'] is None and parent is not None:
+                    span = dict(span, parent=parent.id)
+                self._spans.append(span)
+            for name, value in recorded['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def summary(self) -> Dict:
+        with self._lock:
+            spans, counters = list(self._spans), dict(self._counters)
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span['name'], {'category': span['category'], 'count': 0, 'seconds': 0.0,
+                                                     'max_seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += span['duration']
+            stage['max_seconds'] = max(stage['max_seconds'], span['duration'])
+            for key, value in span['counts'].items():
+                stage[key] = stage.get(key, 0) + value
+        for stage in stages.values():
+            seconds = max(stage['seconds'], 1e-9)
+            if 'frames' in stage:
+                stage['frames_per_second'] = stage['frames'] / seconds
+            for key in ('bytes_read', 'bytes_written'):
+                if key in stage:
+                    stage[f"{key[6:]}_mb_per_second"] = stage[key] / seconds / 1e6
+            stage['mean_seconds'] = stage['seconds'] / stage['count']
+        return {'stages': stages, 'counters': counters}
+
+    def log_summary(self):
+        summary = self.summary()
+        for name, stage in sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds']):
+            extra = ', '.join(f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+                              for key, value in stage.items() if key not in ('category', 'count', 'seconds'))
+            logging.info(f"Trace {name}: {stage['count']}x, {stage['seconds']:.2f}s" + (f" ({extra})" if extra else ""))
+        if summary['counters']:
+            logging.info(f"Trace counters: {summary['counters']}")
+
+    def export_json(self, path: str):
+        with self._lock:
+            spans = list(self._spans)
+        self._write(path, dict(self.summary(), spans=spans))
+
+    def export_chrome(self, path: str):
+        # Trace Event Format: one complete ('X') event per span, timestamps in microseconds
+        with self._lock:
+            spans = list(self._spans)
+        events = [{'name': span['name'], 'cat': span['category'], 'ph': 'X', 'ts': span['start'] * 1e6,
+                   'dur': span['duration'] * 1e6, 'pid': span['pid'], 'tid': span['tid'],
+                   'args': dict(span['attrs'], **span['counts'], id=span['id'], parent=span['parent'])} for span in spans]
+        events.sort(key=lambda event: event['ts'])
+        self._write(path, {'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def export(self, directory: str, json_file: str, chrome_file: str):
+        os.makedirs(directory, exist_ok=True)
+        self.export_json(os.path.join(directory, json_file))
+        self.export_chrome(os.path.join(directory, chrome_file))
+        logging.info(f"Trace written to {os.path.join(directory, json_file)} and {os.path.join(directory, chrome_file)}")
+
+    def _write(self, path: str, payload: Dict):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(payload, f, indent=1)
+        os.replace(tmp, path)
+
+
+TRACER = Tracer(TRACE_FRAME_SAMPLE_EVERY)
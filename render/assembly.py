@@ -0,0 +1,63 @@
+import bisect
+import logging
+from typing import Callable, List, Optional, Union
+
+import moviepy.editor as mp
+import numpy as np
+
+from effects.warps import resize_clip
+
+# A transition takes the tail of one segment and the head of the next and returns the clip that replaces both,
+# or is the path of that clip already rendered (see TransitionEffects.apply_transition)
+Transition = Union[Callable[[mp.VideoClip, mp.VideoClip], mp.VideoClip], str]
+
+
+def build_timeline(clips: List[mp.VideoClip], transitions: List[Optional[Transition]], overlap: float = 1.0) -> List[mp.VideoClip]:
+    # Single pass: every segment contributes its body once and each transition only spans the overlap window
+    pieces = []
+    head_trim = 0.0
+    for i, clip in enumerate(clips):
+        nxt = clips[i + 1] if i + 1 < len(clips) else None
+        transition = transitions[i] if i < len(transitions) else None
+        transition_clip = None
+        if transition is not None and nxt is not None and clip.duration - head_trim > overlap and nxt.duration > overlap:
+            try:
+                if isinstance(transition, str):
+                    transition_clip = mp.VideoFileClip(transition)
+                else:
+                    transition_clip = transition(clip.subclip(clip.duration - overlap), nxt.subclip(0, overlap))
+            except Exception as e:
+                logging.warning(f"Transition {i} -> {i + 1} failed ({e}). Using a hard cut.")
+        body_end = clip.duration - overlap if transition_clip is not None else clip.duration
+        if body_end > head_trim:
+            pieces.append(clip.subclip(head_trim, body_end))
+        if transition_clip is not None:
+            pieces.append(transition_clip)
+            head_trim = overlap
+        else:
+            head_trim = 0.0
+    return pieces
+
+
+def concatenate_flat(pieces: List[mp.VideoClip], size=None, fps=None) -> mp.VideoClip:
+    # moviepy's concatenate_videoclips scans every clip per frame and nests when called repeatedly;
+    # here a frame lookup is one bisect over the piece start times
+    size = tuple(size or pieces[0].size)
+    fps = fps or pieces[0].fps
+    pieces = [p if tuple(p.size) == size else resize_clip(p, size) for p in pieces]
+    starts = np.cumsum([0] + [p.duration for p in pieces]).tolist()
+
+    def make_frame(t):
+        i = min(max(bisect.bisect_right(starts, t) - 1, 0), len(pieces) - 1)
+        return pieces[i].get_frame(min(t - starts[i], pieces[i].duration))
+
+    final = mp.VideoClip(make_frame, duration=starts[-1]).set_fps(fps)
+    audio = [p.audio.set_start(start) for p, start in zip(pieces, starts) if p.audio is not None]
+    if audio:
+        final = final.set_audio(mp.CompositeAudioClip(audio).set_duration(starts[-1]))
+    return final
+
+
+def assemble_timeline(clips: List[mp.VideoClip], transitions: List[Optional[Transition]], overlap: float = 1.0) -> mp.VideoClip:
+    pieces = build_timeline(clips, transitions, overlap)
+    return concatenate_flat(pieces, size=clips[0].size, fps=clips[0].fps)
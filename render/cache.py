@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+from profiling.tracer import TRACER
+
+# Object path -> number of renders in this process that still need it; shared by every RenderCache instance,
+# since batch jobs each hold their own cache over the same directory
+_pinned: Dict[str, int] = {}
+_pinned_lock = threading.Lock()
+
+
+def evict_files(paths: Iterable[str], max_bytes: int, min_age: float = 0.0, keep: Iterable[str] = ()):
+    # Deletes the least recently modified files until their total is within max_bytes, never touching files
+    # modified within min_age or listed in keep; files already gone or still held open are skipped
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - min_age
+    keep = set(keep)
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes or mtime > cutoff:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+class ByteLRU:
+    """In-process LRU of arrays bounded by their total nbytes, safe to share between threads.
+
+    Values are built outside the lock, so a slow build never blocks lookups of other keys; if two threads build
+    the same key, the first to finish wins. The newest entry is always kept, even when it alone exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], object]):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._bytes += value.nbytes
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+            return self._entries[key]
+
+
+class RenderCache:
+    """Content-addressed store for rendered segments and transitions, shared by every job and worker process.
+
+    Objects are files named by their key, so reads need no lock: a hit is an existing file. Writers render to a
+    scratch path on the same filesystem and publish with os.replace, which is atomic, so a reader never sees a
+    partial file. Reads bump the file's mtime; eviction drops the least recently used objects once the store is
+    over max_bytes, skipping anything touched within min_age so files a worker is about to open stay put, and
+    anything pinned by a render in this process until that render has assembled its output.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, min_age: float = 300.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.hits = 0
+        self.misses = 0
+        for sub in ('objects', 'scratch', 'sources'):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def source_digest(self, path: str, block_size: int = 1 << 20) -> str:
+        # Hashing a long source is slow, so the digest is memoised per (path, size, mtime)
+        stat = os.stat(path)
+        memo = os.path.join(self.directory, 'sources',
+                            self.make_key(os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        try:
+            with open(memo) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            pass
+        started = time.perf_counter()
+        digest = hashlib.sha256()
+        with TRACER.span('cache.hash_source', source=path) as span, open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+            span.add(bytes_read=stat.st_size)
+        self._write_atomic(memo, digest.hexdigest())
+        logging.info(f"Hashed {path} in {time.perf_counter() - started:.1f}s")
+        return digest.hexdigest()
+
+    def _write_atomic(self, path: str, text: str):
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def path(self, key: str, suffix: str = '.mp4') -> str:
+        return os.path.join(self.directory, 'objects', key[:2], key + suffix)
+
+    def get(self, key: str, suffix: str = '.mp4') -> Optional[str]:
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            TRACER.count('render_cache.miss')
+            return None
+        self.hits += 1
+        TRACER.count('render_cache.hit')
+        return path
+
+    @contextmanager
+    def pin(self, keys: Iterable[Optional[str]], suffix: str = '.mp4'):
+        # Keeps the objects a render hits or produces out of eviction until it is done with them, however long it runs
+        paths = [self.path(key, suffix) for key in keys if key]
+        with _pinned_lock:
+            for path in paths:
+                _pinned[path] = _pinned.get(path, 0) + 1
+        try:
+            yield
+        finally:
+            with _pinned_lock:
+                for path in paths:
+                    _pinned[path] -= 1
+                    if not _pinned[path]:
+                        del _pinned[path]
+
+    def scratch_path(self, key: str, suffix: str = '.mp4') -> str:
+        # Unique per writer, so two processes rendering the same key never write the same file
+        return os.path.join(self.directory, 'scratch', f"{key}.{os.getpid()}.{uuid.uuid4().hex[:8]}{suffix}")
+
+    def put(self, key: str, rendered: str, suffix: str = '.mp4') -> str:
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(rendered, path)
+        if self.max_bytes is not None:
+            self.evict()
+        return path
+
+    def evict(self):
+        objects = os.path.join(self.directory, 'objects')
+        paths = [entry.path for shard in os.scandir(objects) if shard.is_dir() for entry in os.scandir(shard.path)]
+        with _pinned_lock:
+            pinned = set(_pinned)
+        evict_files(paths, self.max_bytes, self.min_age, pinned)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
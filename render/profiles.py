@@ -0,0 +1,69 @@
+from typing import Dict, List
+
+from config import RENDER_THREADS_PER_ENCODER
+
+# Every encode in the pipeline goes through one of these. Intermediates (segments, transitions) are decoded again
+# by the final assembly, so they trade disk for speed and keep full quality; only the final output pays for a slow
+# preset. keyint keeps GOPs short where files get seeked into (subclips, transition tails).
+PROFILES: Dict[str, Dict] = {
+    'intermediate-lossless-fast': {
+        'codec': 'libx264', 'preset': 'ultrafast', 'crf': 0, 'keyint': 12, 'pix_fmt': 'yuv420p',
+        'audio_codec': 'aac', 'audio_bitrate': '256k',
+    },
+    'preview': {
+        'codec': 'libx264', 'preset': 'ultrafast', 'crf': 28, 'keyint': 24, 'pix_fmt': 'yuv420p',
+        'audio_codec': 'aac', 'audio_bitrate': '96k',
+    },
+    'proxy': {
+        'codec': 'libx264', 'preset': 'ultrafast', 'crf': 28, 'keyint': 12, 'pix_fmt': 'yuv420p',
+        'audio_codec': 'aac', 'audio_bitrate': '96k',
+    },
+    'final': {
+        'codec': 'libx264', 'preset': 'medium', 'crf': 20, 'keyint': None, 'pix_fmt': 'yuv420p',
+        'audio_codec': 'aac', 'audio_bitrate': '192k', 'extra': ['-movflags', '+faststart'],
+    },
+}
+
+
+def get_profile(name: str) -> Dict:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile: {name} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def _video_params(profile: Dict, crf: int) -> List[str]:
+    params = ['-crf', str(crf), '-pix_fmt', profile['pix_fmt']]
+    if profile.get('keyint'):
+        params += ['-g', str(profile['keyint'])]
+    return params + list(profile.get('extra', []))
+
+
+def write_kwargs(name: str, threads: int = None) -> Dict:
+    """Keyword arguments for moviepy's write_videofile."""
+    profile = get_profile(name)
+    return {
+        'codec': profile['codec'],
+        'preset': profile['preset'],
+        'threads': threads or RENDER_THREADS_PER_ENCODER,
+        'audio_codec': profile['audio_codec'],
+        'audio_bitrate': profile['audio_bitrate'],
+        'ffmpeg_params': _video_params(profile, profile['crf']),
+    }
+
+
+def smart_kwargs(name: str, threads: int = None) -> Dict:
+    # Re-encoded GOPs in a smart render must match the source stream (codec, pix_fmt, profile), so only the speed
+    # settings come from the profile. Lossless x264 needs the High 4:4:4 profile, hence the crf floor of 1.
+    profile = get_profile(name)
+    return {
+        'preset': profile['preset'],
+        'threads': threads or RENDER_THREADS_PER_ENCODER,
+        'ffmpeg_params': ['-crf', str(max(1, profile['crf']))],
+    }
+
+
+def ffmpeg_args(name: str) -> List[str]:
+    """Output arguments for an ffmpeg command line."""
+    profile = get_profile(name)
+    return (['-c:v', profile['codec'], '-preset', profile['preset']] + _video_params(profile, profile['crf']) +
+            ['-c:a', profile['audio_codec'], '-b:a', profile['audio_bitrate']])
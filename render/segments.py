@@ -0,0 +1,127 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import moviepy.editor as mp
+
+from effects.effects import VideoEffects
+from media.index import load_index, open_indexed
+from profiling.tracer import TRACER
+from render.profiles import write_kwargs
+from render.smart import render_segment_smart
+
+
+def render_segment(job: Dict, video: mp.VideoClip = None) -> Tuple[str, float]:
+    # Runs inside a pool worker: each worker opens its own reader unless a clip is handed in.
+    # Returns the output path and how many seconds of it were stream-copied rather than encoded.
+    with TRACER.span('segment', index=job['index'], effect=job.get('effect')) as span:
+        output, copied = _render_segment(job, video)
+        span.add(seconds_copied=copied, bytes_written=os.path.getsize(output))
+    return output, copied
+
+
+def _render_traced(job: Dict, frame_sample_every: int) -> Tuple[Tuple[str, float], Dict]:
+    # Pool workers record into their own tracer; their spans travel back with the result
+    TRACER.frame_sample_every = frame_sample_every
+    TRACER.drain()
+    result = render_segment(job)
+    return result, TRACER.drain()
+
+
+def _render_segment(job: Dict, video: mp.VideoClip = None) -> Tuple[str, float]:
+    if job.get('keyframes') is not None:
+        try:
+            result = render_segment_smart(job, job['keyframes'])
+            if result is not None:
+                return result
+        except (TypeError, KeyError, AttributeError, NameError):
+            # A bug in the smart path, not a property of this source: loud, so the fallback can't hide it
+            logging.exception(f"Smart render of segment {job['index']} raised a programming error; re-encoding it fully")
+        except Exception as e:
+            logging.warning(f"Smart render of segment {job['index']} failed ({e}), re-encoding it fully")
+    clip = video if video is not None else open_indexed(job['source'])
+    try:
+        segment = clip.subclip(job['start'], job['end'])
+        if job.get('effect'):
+            segment = VideoEffects.apply_effect(segment, job['effect'], **job.get('kwargs', {}))
+        segment.write_videofile(job['output'], logger=None,
+                                **write_kwargs(job.get('profile', 'intermediate-lossless-fast'), job.get('threads')))
+        TRACER.add(frames=int(segment.duration * segment.fps))
+    finally:
+        if video is None:
+            clip.close()
+    return job['output'], 0.0
+
+
+class SegmentRenderer:
+    def __init__(self, workers: int = 1, threads_per_encoder: int = None, max_retries: int = 1, smart: bool = False):
+        self.workers = workers
+        self.threads_per_encoder = threads_per_encoder
+        self.max_retries = max_retries
+        self.smart = smart
+
+    def _keyframes(self, source: str):
+        try:
+            return load_index(source).keyframes
+        except Exception as e:
+            logging.warning(f"Could not read keyframes of {source} ({e}); smart render disabled")
+            return None
+
+    def render(self, jobs: List[Dict], video: mp.VideoClip = None) -> List[str]:
+        keyframes = {}
+        if self.smart:
+            keyframes = {source: self._keyframes(source) for source in {job['source'] for job in jobs}}
+        jobs = [dict(job, threads=job.get('threads', self.threads_per_encoder), keyframes=keyframes.get(job['source']))
+                for job in jobs]
+        started = time.perf_counter()
+        with TRACER.span('render.segments', workers=self.workers) as span:
+            span.add(segments=len(jobs))
+            if self.workers <= 1 or len(jobs) <= 1:
+                results = [self._render_serial(job, video) for job in jobs]
+            else:
+                results = self._render_parallel(jobs)
+        elapsed = time.perf_counter() - started
+        if jobs:
+            total = sum(job['end'] - job['start'] for job in jobs)
+            copied = sum(copied for _, copied in results)
+            logging.info(f"Rendered {len(jobs)} segments in {elapsed:.1f}s "
+                         f"({len(jobs) * 60 / max(elapsed, 1e-6):.1f} segments/min, {self.workers} workers, "
+                         f"{copied:.1f}s of {total:.1f}s stream-copied)")
+        return [output for output, _ in results]
+
+    def _render_serial(self, job: Dict, video: mp.VideoClip) -> Tuple[str, float]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return render_segment(job, video)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Segment {job['index']} failed ({e}), retrying")
+
+    def _render_parallel(self, jobs: List[Dict]) -> List[Tuple[str, float]]:
+        outputs = [None] * len(jobs)
+        # Never fork: the batch runner calls this from a worker thread while transcription, HTTP and SQLite threads hold
+        # locks (logging's included) that a forked child would inherit locked
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method)) as pool:
+            def submit(job):
+                return pool.submit(_render_traced, job, TRACER.frame_sample_every)
+
+            futures = {i: submit(job) for i, job in enumerate(jobs)}
+            attempts = {i: 0 for i in futures}
+            # Collect in order; a failed segment is resubmitted on its own while the others keep encoding
+            for i in range(len(jobs)):
+                while outputs[i] is None:
+                    try:
+                        outputs[i], recorded = futures[i].result()
+                        TRACER.merge(recorded)
+                    except Exception as e:
+                        if attempts[i] >= self.max_retries:
+                            raise
+                        attempts[i] += 1
+                        logging.warning(f"Segment {jobs[i]['index']} failed ({e}), retrying")
+                        futures[i] = submit(jobs[i])
+        return outputs
@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from moviepy.config import get_setting
+
+from config import FFPROBE_BINARY
+from effects.effects import VideoEffects
+from media.index import load_index, open_indexed
+from render.profiles import get_profile, smart_kwargs
+
+# Encoders that can produce parts the source's stream can be concatenated with
+ENCODERS = {'h264': 'libx264', 'hevc': 'libx265', 'mpeg4': 'mpeg4', 'vp9': 'libvpx-vp9'}
+
+X264_PROFILES = {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+                 'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444'}
+
+
+def effect_edges(effect: Optional[str], kwargs: Dict, duration: float) -> Optional[Tuple[float, float]]:
+    # Seconds at the (head, tail) of a segment whose frames an effect changes; None if it touches every frame
+    if not effect:
+        return 0.0, 0.0
+    fade = float(kwargs.get('duration', 1))
+    if effect == 'fadein':
+        return fade, 0.0
+    if effect == 'fadeout':
+        return 0.0, fade
+    if effect == 'fadeinout':
+        return fade, fade
+    return None
+
+
+def probe_streams(path: str) -> Dict[str, Dict]:
+    out = subprocess.run([FFPROBE_BINARY, '-v', 'error', '-show_streams', '-of', 'json', path],
+                         capture_output=True, check=True, text=True).stdout
+    streams = {}
+    for stream in json.loads(out).get('streams', []):
+        streams.setdefault(stream['codec_type'], stream)
+    return streams
+
+
+def plan_copy_range(keyframes: List[float], start: float, end: float, head: float, tail: float) -> Optional[Tuple[float, float]]:
+    # Stream copy has to start on a keyframe and stop right before one
+    i = bisect_left(keyframes, start + head)
+    j = bisect_right(keyframes, end - tail) - 1
+    if i >= len(keyframes) or j < 0 or keyframes[i] >= keyframes[j]:
+        return None
+    return keyframes[i], keyframes[j]
+
+
+def _encode_params(streams: Dict[str, Dict]) -> Optional[Dict]:
+    video = streams.get('video')
+    if not video or video.get('codec_name') not in ENCODERS:
+        return None
+    num, den = (int(x) for x in video['r_frame_rate'].split('/'))
+    ffmpeg_params = ['-pix_fmt', video.get('pix_fmt', 'yuv420p'),
+                     '-video_track_timescale', video['time_base'].split('/')[1]]
+    if video.get('codec_name') == 'h264' and video.get('profile') in X264_PROFILES:
+        ffmpeg_params += ['-profile:v', X264_PROFILES[video['profile']]]
+    return {'codec': ENCODERS[video['codec_name']], 'fps': num / den, 'ffmpeg_params': ffmpeg_params, 'audio': False}
+
+
+def _ffmpeg(args: List[str]):
+    subprocess.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error'] + args, check=True)
+
+
+def render_segment_smart(job: Dict, keyframes: List[float] = None) -> Optional[Tuple[str, float]]:
+    """Re-encode only the GOPs around the cut points and effect ranges and stream-copy the rest.
+
+    Returns (output, copied_seconds), or None when the job has to go through a full re-encode.
+    """
+    source, start, end = job['source'], job['start'], job['end']
+    edges = effect_edges(job.get('effect'), job.get('kwargs', {}), end - start)
+    if edges is None:
+        return None
+    streams = probe_streams(source)
+    params = _encode_params(streams)
+    if params is None:
+        return None
+    keyframes = keyframes if keyframes is not None else load_index(source).keyframes
+    copy_range = plan_copy_range(keyframes, start, end, *edges)
+    if copy_range is None:
+        return None
+    copy_start, copy_end = copy_range
+
+    fps = params['fps']
+    # The concat demuxer stops on decode timestamps, which run ahead of presentation by the B-frame delay
+    outpoint = copy_end - (int(streams['video'].get('has_b_frames', 0)) + 0.5) / fps
+
+    workdir = tempfile.mkdtemp(prefix='smart_', dir=os.path.dirname(os.path.abspath(job['output'])))
+    reader = None
+    try:
+        reader = open_indexed(source)
+        clip = reader.subclip(start, end)
+        if job.get('effect'):
+            clip = VideoEffects.apply_effect(clip, job['effect'], **job.get('kwargs', {}))
+        parts = []
+        profile = job.get('profile', 'intermediate-lossless-fast')
+        speed = smart_kwargs(profile, job.get('threads'))
+        encode = dict(params, **speed)
+        encode['ffmpeg_params'] = params['ffmpeg_params'] + speed['ffmpeg_params']
+        if copy_start > start:
+            head = os.path.join(workdir, 'head.mp4')
+            clip.subclip(0, copy_start - start).write_videofile(head, logger=None, **encode)
+            parts.append((head, None, None))
+        # The copied GOPs are read straight from the source by the concat demuxer
+        parts.append((source, copy_start, outpoint))
+        if copy_end < end:
+            tail = os.path.join(workdir, 'tail.mp4')
+            clip.subclip(copy_end - start, end - start).write_videofile(tail, logger=None, **encode)
+            parts.append((tail, None, None))
+
+        # The concat demuxer carries each part's parameter sets over, so re-encoded and copied GOPs join cleanly
+        playlist = os.path.join(workdir, 'parts.txt')
+        with open(playlist, 'w') as f:
+            for part, inpoint, part_outpoint in parts:
+                f.write(f"file '{os.path.abspath(part)}'\n")
+                if inpoint is not None:
+                    f.write(f"inpoint {inpoint:.6f}\noutpoint {part_outpoint:.6f}\nduration {copy_end - copy_start:.6f}\n")
+        video = os.path.join(workdir, 'video.mp4')
+        _ffmpeg(['-f', 'concat', '-safe', '0', '-i', playlist, '-map', '0:v:0', '-c', 'copy', video])
+
+        # Audio is cheap to encode, so it is re-encoded in one piece rather than spliced at GOP boundaries
+        if clip.audio is not None and 'audio' in streams:
+            audio = os.path.join(workdir, 'audio.m4a')
+            clip.audio.write_audiofile(audio, fps=int(streams['audio'].get('sample_rate', 44100)),
+                                       codec='aac', bitrate=get_profile(profile)['audio_bitrate'], logger=None)
+            _ffmpeg(['-i', video, '-i', audio, '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', job['output']])
+        else:
+            shutil.move(video, job['output'])
+    finally:
+        # Closed on failure too, or every failed attempt leaves an ffmpeg reader behind before the full re-encode
+        if reader is not None:
+            reader.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return job['output'], copy_end - copy_start
@@ -0,0 +1,150 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from selection.signals import CUT_THRESHOLD
+
+# Words in a segment's speech that suggest an effect, or a transition into the segment
+KEYWORDS = {
+    'fadein': ('welcome', 'introduction', 'intro', 'hello everyone', 'today we'),
+    'fadeout': ('thanks for watching', 'thank you', 'subscribe', 'goodbye', 'see you', 'in conclusion', 'wrap up'),
+    'blackwhite': ('history', 'flashback', 'years ago', 'back then', 'remember when', 'old days'),
+    'saturation': ('colorful', 'colourful', 'vibrant', 'bright colors'),
+    'heart_shape_transition': ('love', 'heart', 'wedding', 'romantic'),
+    'starfield_transition': ('space', 'stars', 'galaxy', 'universe', 'planet', 'night sky'),
+    'light_leak_transition': ('summer', 'sunset', 'sunshine', 'memories', 'vacation', 'travel', 'beach'),
+    'circle_reveal_transition': ('reveal', 'introducing', 'announce', 'surprise', 'finally', 'here it is'),
+    'diagonal_wipe_transition': ('next', 'moving on', 'meanwhile', 'another', 'step'),
+    'split_transition': ('versus', 'compare', 'comparison', 'on the other hand', 'before and after'),
+}
+
+KEYWORD_WEIGHT = 1.5
+
+
+def keyword_hits(text: str, name: str) -> int:
+    text = f" {text.lower()} "
+    return sum(1 for word in KEYWORDS.get(name, ()) if re.search(rf"\b{re.escape(word)}\b", text))
+
+
+def effect_scores(segment: Dict, first: bool, last: bool) -> Dict[Optional[str], Tuple[float, str]]:
+    # Candidate -> (score, reason); leaving the segment untouched scores 1 and is also what smart render copies
+    scores = {None: (1.0, "no strong signal")}
+    if first and last:
+        scores['fadeinout'] = (2.0, "only segment")
+    elif first:
+        scores['fadein'] = (2.0, "opening segment")
+    elif last:
+        scores['fadeout'] = (2.0, "closing segment")
+    if segment['brightness'] < 0.3:
+        scores['brightness'] = (1.5 + (0.3 - segment['brightness']) * 10, f"dark (mean luma {segment['brightness']:.2f})")
+    if segment['contrast'] < 0.12:
+        scores['lum_contrast'] = (1.5 + (0.12 - segment['contrast']) * 20, f"flat (luma std {segment['contrast']:.2f})")
+    if segment['saturation'] < 0.12 and segment['contrast'] >= 0.12:
+        scores['saturation'] = (1.4 + (0.12 - segment['saturation']) * 10, f"washed out (saturation {segment['saturation']:.2f})")
+    for name in ('fadein', 'fadeout', 'blackwhite', 'saturation'):
+        hits = keyword_hits(segment['text'], name)
+        if hits:
+            score, reason = scores.get(name, (1.0, ''))
+            scores[name] = (score + KEYWORD_WEIGHT * hits, f"{reason + ', ' if reason else ''}{hits} keyword(s)")
+    return scores
+
+
+def transition_scores(boundary: Dict, next_segment: Dict) -> Dict[Optional[str], Tuple[float, str]]:
+    # A hard cut scores 1: speech running across the boundary is better left uninterrupted
+    scores = {None: (1.0, "speech continues" if boundary['pause'] == 0 else "no strong signal")}
+    pause = boundary['pause']
+    if pause is not None and pause >= 0.6:
+        scores['crossfade_transition'] = (1.5 + min(pause, 2.0) * 0.5, f"{pause:.1f}s pause")
+    if boundary['cut'] >= CUT_THRESHOLD and (pause is None or pause >= 0.3):
+        scores['diagonal_wipe_transition'] = (1.6 + boundary['cut'], f"scene change (cut score {boundary['cut']:.2f})")
+    if abs(boundary['brightness_change']) >= 0.25:
+        scores['fade_transition'] = (1.5 + abs(boundary['brightness_change']) * 2,
+                                     f"brightness jump {boundary['brightness_change']:+.2f}")
+    if boundary['motion'] >= 0.08 and (pause is None or pause > 0):
+        scores['circle_reveal_transition'] = (1.4 + boundary['motion'], f"high motion {boundary['motion']:.2f}")
+    # The transition leads into the next segment, so its opening words count
+    opening = ' '.join(next_segment['text'].split()[:30])
+    for name in ('heart_shape_transition', 'starfield_transition', 'light_leak_transition', 'circle_reveal_transition',
+                 'diagonal_wipe_transition', 'split_transition'):
+        hits = keyword_hits(opening, name)
+        if hits:
+            score, reason = scores.get(name, (1.0, ''))
+            scores[name] = (score + KEYWORD_WEIGHT * hits, f"{reason + ', ' if reason else ''}{hits} keyword(s)")
+    return scores
+
+
+def _best(scores: Dict[Optional[str], Tuple[float, str]], available) -> Tuple[Optional[str], str]:
+    candidates = [(score, name or '', name, reason) for name, (score, reason) in scores.items()
+                  if name is None or name in available]
+    _, _, name, reason = max(candidates)
+    return name, reason
+
+
+class HeuristicSelector:
+    """Picks an effect per segment and a transition per boundary from frame and speech signals, with no network.
+
+    Every candidate is scored by a few rules; the highest score wins, and "no effect" / "hard cut" compete like any
+    other candidate. Only the effect and transition names passed in can be picked.
+    """
+
+    def __init__(self, effects: List[str], transitions: List[str]):
+        self.effects = effects
+        self.transitions = transitions
+
+    def select(self, segments: List[Dict], boundaries: List[Dict]) -> Tuple[List[Optional[str]], List[Optional[str]], List[str]]:
+        effect_names, transition_names, reasons = [], [], []
+        for i, segment in enumerate(segments):
+            name, reason = _best(effect_scores(segment, i == 0, i == len(segments) - 1), self.effects)
+            effect_names.append(name)
+            reasons.append(f"segment {i}: {name or 'no effect'} ({reason})")
+        for boundary in boundaries:
+            name, reason = _best(transition_scores(boundary, segments[boundary['index'] + 1]), self.transitions)
+            transition_names.append(name)
+            reasons.append(f"boundary {boundary['index']}: {name or 'cut'} ({reason})")
+        return effect_names, transition_names, reasons
+
+
+def refinement_prompt(segments: List[Dict], boundaries: List[Dict], effect_names: List[Optional[str]],
+                      transition_names: List[Optional[str]], effects: List[str], transitions: List[str]) -> str:
+    # One prompt for the whole video: the measured signals, the local picks, and the allowed names
+    lines = ["A video has been split into segments. For each segment you get its time range, measured signals, "
+             "the start of its speech and a proposed effect; for each boundary, its signals and a proposed transition.",
+             "Improve the proposals where the content calls for it.", ""]
+    for segment, effect in zip(segments, effect_names):
+        rate = '' if segment['words_per_second'] is None else f", {segment['words_per_second']:.1f} words/s"
+        lines.append(f"Segment {segment['index'] + 1} ({segment['start']:.1f}-{segment['end']:.1f}s, "
+                     f"motion {segment['motion']:.2f}, brightness {segment['brightness']:.2f}{rate}): "
+                     f"\"{segment['text'][:200]}\" -> effect: {effect or 'none'}")
+    for boundary, transition in zip(boundaries, transition_names):
+        pause = 'unknown' if boundary['pause'] is None else f"{boundary['pause']:.1f}s"
+        lines.append(f"Boundary {boundary['index'] + 1}->{boundary['index'] + 2} (pause {pause}, "
+                     f"scene cut {boundary['cut']:.2f}, brightness change {boundary['brightness_change']:+.2f}) "
+                     f"-> transition: {transition or 'none'}")
+    lines += ["", f"Effects: {', '.join(effects)}", f"Transitions: {', '.join(transitions)}", "",
+              f"Respond with only a JSON object {{\"effects\": [{len(segments)} names or null], "
+              f"\"transitions\": [{len(boundaries)} names or null]}}."]
+    return '\n'.join(lines)
+
+
+def parse_refinement(response: Optional[str], effect_names: List[Optional[str]], transition_names: List[Optional[str]],
+                     effects, transitions) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+    # Anything missing, malformed or unknown keeps the local pick
+    match = re.search(r'\{.*\}', response or '', re.DOTALL)
+    try:
+        refined = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        refined = {}
+
+    def merge(proposed, picks, allowed):
+        if not isinstance(proposed, list) or len(proposed) != len(picks):
+            return picks
+        merged = []
+        for p, pick in zip(proposed, picks):
+            if p is None or (isinstance(p, str) and p.lower() == 'none'):
+                merged.append(None)
+            else:
+                merged.append(p if isinstance(p, str) and p in allowed else pick)
+        return merged
+
+    return (merge(refined.get('effects'), effect_names, effects),
+            merge(refined.get('transitions'), transition_names, transitions))
@@ -0,0 +1,131 @@
+import logging
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from moviepy.config import get_setting
+
+from profiling.tracer import TRACER
+
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+HISTOGRAM_BINS = 16
+CUT_THRESHOLD = 0.35  # Histogram distance between consecutive samples that counts as a scene cut
+# Stands in for a source with no decodable frames: mid brightness, contrast and saturation trip no effect rule
+NEUTRAL = {'brightness': 0.5, 'contrast': 0.2, 'saturation': 0.2, 'motion': 0.0, 'cut': 0.0}
+
+
+class FrameSignals:
+    """Per-frame statistics of a thumbnail-sized, low-frame-rate decode of the whole source.
+
+    A single ffmpeg pass scales and drops frames before they reach Python, so a long video yields a few thousand
+    tiny frames; every segment and boundary signal is then a slice of these arrays.
+    """
+
+    def __init__(self, frames: np.ndarray, fps: float):
+        self.fps = fps
+        if not len(frames):
+            # One neutral sample, so every window still has something to average and selection picks nothing
+            self.times = np.zeros(1)
+            for name, value in NEUTRAL.items():
+                setattr(self, name, np.full(1, value, dtype=np.float32))
+            return
+        self.times = np.arange(len(frames)) / fps
+        rgb = frames.astype(np.float32) / 255
+        luma = rgb @ LUMA
+        self.brightness = luma.mean(axis=(1, 2))
+        self.contrast = luma.std(axis=(1, 2))
+        self.saturation = (rgb.max(axis=3) - rgb.min(axis=3)).mean(axis=(1, 2))
+        histograms = np.stack([np.histogram(f, bins=HISTOGRAM_BINS, range=(0, 1))[0] for f in luma]).astype(np.float32)
+        histograms /= np.maximum(histograms.sum(axis=1, keepdims=True), 1)
+        # Change from the previous sample: mean absolute luma difference (motion) and histogram distance (cuts),
+        # both in 0..1; the first sample has none
+        self.motion = np.concatenate([[0.0], np.abs(np.diff(luma, axis=0)).mean(axis=(1, 2))])
+        self.cut = np.concatenate([[0.0], 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)])
+
+    @classmethod
+    def from_video(cls, path: str, fps: float = 2.0, width: int = 64, height: int = 36) -> "FrameSignals":
+        started = time.perf_counter()
+        with TRACER.span('selection.decode', source=path) as span:
+            # Thumbnails don't need B-frames or deblocking; skipping them makes the pass about 3x faster
+            try:
+                raw = subprocess.run([get_setting("FFMPEG_BINARY"), '-v', 'error', '-skip_loop_filter', 'all', '-skip_frame', 'bidir',
+                                      '-i', path, '-an', '-vf', f"fps={fps:g},scale={width}:{height}:flags=area",
+                                      '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'],
+                                     capture_output=True, check=True).stdout
+            except subprocess.CalledProcessError as e:
+                # Audio-only or undecodable: selection goes on with neutral signals rather than failing the plan
+                logging.warning(f"Could not sample frames of {path} ({' '.join(e.stderr.decode(errors='replace').split())[-200:]}); "
+                                f"selecting from speech only")
+                raw = b''
+            frames = np.frombuffer(raw, dtype=np.uint8).reshape(-1, height, width, 3)
+            span.add(frames=len(frames))
+        logging.info(f"Sampled {len(frames)} frames of {path} for edit selection in {time.perf_counter() - started:.1f}s")
+        return cls(frames, fps)
+
+    def window(self, start: float, end: float) -> slice:
+        lo = min(int(np.searchsorted(self.times, start, side='left')), len(self.times) - 1)
+        hi = int(np.searchsorted(self.times, end, side='left'))
+        return slice(lo, max(hi, lo + 1))
+
+
+def _speech_in(speech: List[Dict], start: float, end: float) -> List[Dict]:
+    return [s for s in speech if s['end'] > start and s['start'] < end]
+
+
+def _pause_at(speech: List[Dict], boundary: float, start: float, end: float) -> float:
+    # Silence around the boundary: from the last speech ending before it to the first starting after it
+    if any(s['start'] < boundary < s['end'] for s in speech):
+        return 0.0
+    last_end = max((s['end'] for s in speech if s['end'] <= boundary), default=start)
+    next_start = min((s['start'] for s in speech if s['start'] >= boundary), default=end)
+    return max(0.0, next_start - last_end)
+
+
+def segment_signals(frames: FrameSignals, topics: List[Dict[str, float]], speech: Optional[List[Dict]] = None) -> List[Dict]:
+    signals = []
+    for i, topic in enumerate(topics):
+        window = frames.window(topic['start'], topic['end'])
+        duration = max(topic['end'] - topic['start'], 1e-6)
+        cuts = frames.cut[window][1:]
+        signal = {
+            'index': i,
+            'start': topic['start'],
+            'end': topic['end'],
+            'motion': float(frames.motion[window][1:].mean()) if len(cuts) else 0.0,
+            'cuts_per_minute': float((cuts > CUT_THRESHOLD).sum()) * 60 / duration,
+            'brightness': float(frames.brightness[window].mean()),
+            'contrast': float(frames.contrast[window].mean()),
+            'saturation': float(frames.saturation[window].mean()),
+            'text': '',
+            'words_per_second': None,
+            'speech_coverage': None,
+        }
+        if speech is not None:
+            spoken = _speech_in(speech, topic['start'], topic['end'])
+            signal['text'] = ' '.join(s['text'] for s in spoken if s.get('text'))
+            signal['words_per_second'] = len(signal['text'].split()) / duration
+            signal['speech_coverage'] = sum(min(s['end'], topic['end']) - max(s['start'], topic['start'])
+                                            for s in spoken) / duration
+        signals.append(signal)
+    return signals
+
+
+def boundary_signals(frames: FrameSignals, topics: List[Dict[str, float]], speech: Optional[List[Dict]] = None,
+                     span: float = 1.0) -> List[Dict]:
+    # Boundary i sits between topics i and i + 1, at the end of topic i
+    signals = []
+    for i in range(len(topics) - 1):
+        boundary = topics[i]['end']
+        before = frames.window(boundary - span, boundary)
+        after = frames.window(boundary, boundary + span)
+        around = frames.window(boundary - span / 2, boundary + span / 2)
+        signals.append({
+            'index': i,
+            'time': boundary,
+            'cut': float(frames.cut[around].max()),
+            'brightness_change': float(frames.brightness[after].mean() - frames.brightness[before].mean()),
+            'motion': float(frames.motion[frames.window(boundary - span, boundary + span)].mean()),
+            'pause': None if speech is None else _pause_at(speech, boundary, topics[i]['start'], topics[i + 1]['end']),
+        })
+    return signals
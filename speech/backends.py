@@ -0,0 +1,79 @@
+import speech_recognition as sr
+from typing import Dict, List, Optional
+
+
+def _offset_seconds(value) -> float:
+    # Google returns durations as "1.500s" strings (or {"seconds", "nanos"} on older API versions)
+    if isinstance(value, dict):
+        return float(value.get('seconds', 0)) + float(value.get('nanos', 0)) / 1e9
+    return float(str(value).rstrip('s') or 0)
+
+
+class SpeechBackend:
+    """Recognizes one window of audio; times in the returned segments are relative to the window."""
+
+    def recognize(self, audio: sr.AudioData) -> List[Dict]:
+        raise NotImplementedError
+
+
+class GoogleCloudBackend(SpeechBackend):
+    def __init__(self, credentials_json: Optional[str] = None, language: str = 'en-US'):
+        self.recognizer = sr.Recognizer()
+        self.credentials_json = credentials_json
+        self.language = language
+
+    def recognize(self, audio: sr.AudioData) -> List[Dict]:
+        response = self.recognizer.recognize_google_cloud(
+            audio, credentials_json=self.credentials_json, language=self.language, show_all=True)
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        segments = []
+        start = 0.0
+        for result in response.get('results', []):
+            alternatives = result.get('alternatives', [])
+            if not alternatives:
+                continue
+            best = alternatives[0]
+            words = [{'word': w.get('word', ''),
+                      'start': _offset_seconds(w.get('startTime', 0)),
+                      'end': _offset_seconds(w.get('endTime', 0))}
+                     for w in best.get('words', [])]
+            if words:
+                seg_start, seg_end = words[0]['start'], words[-1]['end']
+            elif 'timestamp' in best:
+                seg_start, seg_end = best['timestamp'][0], best['timestamp'][1]
+            else:
+                seg_start = start
+                seg_end = _offset_seconds(result['resultEndTime']) if 'resultEndTime' in result else duration
+            segments.append({'text': best.get('transcript', '').strip(), 'start': seg_start, 'end': seg_end, 'words': words})
+            start = seg_end
+        return segments
+
+
+class SphinxBackend(SpeechBackend):
+    # Offline recognizer, needs pocketsphinx installed
+    def __init__(self, language: str = 'en-US'):
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def recognize(self, audio: sr.AudioData) -> List[Dict]:
+        decoder = self.recognizer.recognize_sphinx(audio, language=self.language, show_all=True)
+        words = []
+        for seg in decoder.seg():
+            if seg.word in ('<s>', '</s>', '<sil>') or seg.word.startswith('['):
+                continue
+            words.append({'word': seg.word.split('(')[0], 'start': seg.start_frame / 100.0, 'end': seg.end_frame / 100.0})
+        if not words:
+            return []
+        return [{'text': ' '.join(w['word'] for w in words), 'start': words[0]['start'], 'end': words[-1]['end'], 'words': words}]
+
+
+BACKENDS = {
+    'google_cloud': GoogleCloudBackend,
+    'sphinx': SphinxBackend,
+}
+
+
+def get_backend(name: str, **kwargs) -> SpeechBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech backend: {name}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,127 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import speech_recognition as sr
+from typing import Dict, Iterator, List, Tuple
+
+from media.source import MediaSource
+from profiling.tracer import TRACER
+from speech.backends import SpeechBackend
+
+
+class ChunkedTranscriber:
+    def __init__(self, backend: SpeechBackend, window_seconds: float = 50.0, overlap_seconds: float = 1.0,
+                 silence_search_seconds: float = 5.0, silence_threshold: float = 0.01, max_workers: int = 4):
+        self.backend = backend
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.silence_search_seconds = silence_search_seconds
+        self.silence_threshold = silence_threshold
+        self.max_workers = max_workers
+
+    def _find_cut(self, samples: np.ndarray, target: int, search: int, rate: int) -> Tuple[int, bool]:
+        # Quietest 20ms frame in the last `search` samples before the target cut
+        frame = max(1, rate // 50)
+        lo = max(frame, target - search)
+        region = samples[lo:target].astype(np.float32)
+        n = len(region) // frame
+        if n == 0:
+            return target, False
+        full_scale = float(np.iinfo(samples.dtype).max)
+        rms = np.sqrt(np.mean(region[:n * frame].reshape(n, frame) ** 2, axis=1)) / full_scale
+        quietest = int(np.argmin(rms))
+        if rms[quietest] < self.silence_threshold:
+            return lo + quietest * frame + frame // 2, True
+        return target, False
+
+    def iter_windows(self, source: MediaSource) -> Iterator[Dict]:
+        rate = source.sample_rate
+        dtype = {1: '<i1', 2: '<i2', 4: '<i4'}[source.sample_width]
+        window = int(self.window_seconds * rate)
+        overlap = int(self.overlap_seconds * rate)
+        search = int(self.silence_search_seconds * rate)
+
+        buffer = np.zeros(0, dtype=dtype)
+        buffer_start = 0  # absolute sample index of buffer[0]
+        keep_from = 0  # absolute sample index where this window's ownership starts
+        index = 0
+        for _, pcm in source.iter_pcm_chunks(self.window_seconds / 2):
+            TRACER.add(bytes_read=len(pcm))
+            buffer = np.concatenate([buffer, np.frombuffer(pcm, dtype=dtype)])
+            while len(buffer) >= window + overlap:
+                cut, silent = self._find_cut(buffer, window, search, rate)
+                margin = 0 if silent else overlap
+                end = cut + margin
+                yield self._window(index, buffer[:end], buffer_start, keep_from, buffer_start + cut, source)
+                index += 1
+                keep_from = buffer_start + cut
+                buffer = buffer[cut - margin:]
+                buffer_start += cut - margin
+        if len(buffer):
+            yield self._window(index, buffer, buffer_start, keep_from, None, source)
+
+    def _window(self, index: int, samples: np.ndarray, start: int, keep_from: int, keep_until, source: MediaSource) -> Dict:
+        rate = source.sample_rate
+        return {
+            'index': index,
+            'offset': start / rate,
+            'keep_from': keep_from / rate,
+            'keep_until': None if keep_until is None else keep_until / rate,
+            'audio': sr.AudioData(samples.tobytes(), rate, source.sample_width),
+        }
+
+    def _recognize(self, window: Dict) -> List[Dict]:
+        audio = window['audio']
+        try:
+            with TRACER.span('speech.recognize', window=window['index']) as span:
+                span.add(audio_seconds=len(audio.frame_data) / (audio.sample_rate * audio.sample_width))
+                segments = self.backend.recognize(audio)
+        except sr.UnknownValueError:
+            logging.warning(f"Speech backend could not understand audio at {window['offset']:.1f}s")
+            return []
+        except sr.RequestError as e:
+            logging.error(f"Speech backend request failed at {window['offset']:.1f}s; {e}")
+            return []
+
+        offset = window['offset']
+        keep_until = window['keep_until'] if window['keep_until'] is not None else float('inf')
+
+        def owned(start, end):
+            # Overlap regions are transcribed twice; a word belongs to the window holding its midpoint
+            mid = offset + (start + end) / 2
+            return window['keep_from'] <= mid < keep_until
+
+        stitched = []
+        for segment in segments:
+            words = [{'word': w['word'], 'start': offset + w['start'], 'end': offset + w['end']}
+                     for w in segment.get('words', []) if owned(w['start'], w['end'])]
+            if segment.get('words'):
+                if not words:
+                    continue
+                stitched.append({'text': ' '.join(w['word'] for w in words),
+                                 'start': words[0]['start'], 'end': words[-1]['end'], 'words': words})
+            elif owned(segment['start'], segment['end']):
+                stitched.append({'text': segment['text'], 'start': offset + segment['start'],
+                                 'end': offset + segment['end'], 'words': []})
+        logging.info(f"Transcribed window {window['index']} at {offset:.1f}s ({len(stitched)} segments)")
+        return stitched
+
+    def transcribe(self, source: MediaSource) -> List[Dict]:
+        if not source.has_audio:
+            logging.warning(f"No audio track in {source.path}")
+            return []
+
+        segments = []
+        # At most 2 * max_workers windows of PCM are held in memory at once
+        with TRACER.span('transcribe', source=source.path) as span, ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            recognize = TRACER.bind(self._recognize)
+            for window in self.iter_windows(source):
+                span.add(windows=1)
+                pending.append(pool.submit(recognize, window))
+                while len(pending) > self.max_workers * 2:
+                    segments.extend(pending.popleft().result())
+            while pending:
+                segments.extend(pending.popleft().result())
+        return segments
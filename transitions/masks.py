@@ -0,0 +1,140 @@
+import os
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from config import TRANSITION_MASK_CACHE_BYTES, TRANSITION_MASK_DIR, TRANSITION_MASK_DIR_MAX_BYTES
+from render.cache import ByteLRU, evict_files
+
+
+# Each shape is a "reveal field" over the frame: a pixel switches to clip2 once progress passes its value
+def _grid(w: int, h: int) -> Tuple[np.ndarray, np.ndarray]:
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    return (x + 0.5) / w, (y + 0.5) / h
+
+
+def circle_field(w: int, h: int) -> np.ndarray:
+    x, y = _grid(w, h)
+    r = np.hypot((x - 0.5) * w, (y - 0.5) * h)
+    return r / r.max()
+
+
+def diagonal_field(w: int, h: int) -> np.ndarray:
+    x, y = _grid(w, h)
+    return (x + y) / 2
+
+
+def split_field(w: int, h: int, splits: int = 4) -> np.ndarray:
+    # Every vertical strip opens from its centre line outwards
+    x, _ = _grid(w, h)
+    strip = x * splits
+    return np.abs(strip - np.floor(strip) - 0.5) * 2
+
+
+def heart_field(w: int, h: int) -> np.ndarray:
+    # Polar radius of the parametric heart curve per direction; a pixel's value is how far it sits
+    # out along its ray relative to the curve, so growing the threshold grows the heart
+    t = np.linspace(0, 2 * np.pi, 2048, endpoint=False)
+    hx = 16 * np.sin(t) ** 3
+    hy = 13 * np.cos(t) - 5 * np.cos(2 * t) - 2 * np.cos(3 * t) - np.cos(4 * t)
+    angles = np.arctan2(hy, hx)
+    order = np.argsort(angles)
+    angles, radii = angles[order], np.hypot(hx, hy)[order]
+    x, y = _grid(w, h)
+    px = (x - 0.5) * w / min(w, h) * 34
+    py = (0.45 - y) * h / min(w, h) * 34
+    boundary = np.interp(np.arctan2(py, px), angles, radii, period=2 * np.pi)
+    field = np.hypot(px, py) / boundary
+    return field / field.max()
+
+
+SHAPES: Dict[str, Callable[[int, int], np.ndarray]] = {
+    'circle': circle_field,
+    'diagonal': diagonal_field,
+    'split': split_field,
+    'heart': heart_field,
+}
+
+
+def generate_masks(shape: str, size: Tuple[int, int], frames: int, softness: float = 0.02) -> np.ndarray:
+    w, h = size
+    field = SHAPES[shape](w, h).astype(np.float32)
+    masks = np.empty((frames, h, w), np.uint8)
+    alpha = np.empty((h, w), np.float32)
+    for k in range(frames):
+        progress = (k + 1) / frames * (1 + softness)
+        np.subtract(progress, field, out=alpha)
+        np.multiply(alpha, 255 / softness, out=alpha)
+        np.clip(alpha, 0, 255, out=alpha)
+        np.copyto(masks[k], alpha, casting='unsafe')
+    return masks
+
+
+class MaskCache(ByteLRU):
+    """Alpha mask families keyed by (shape, resolution, frame count), shared by every boundary in the process.
+
+    Families are kept in a byte-bounded LRU; with a directory they are also written there as .npy and
+    served memory-mapped, so other jobs and processes pick them up without regenerating. Loading a file bumps
+    its mtime, and each new file evicts the least recently used ones once the directory is over max_disk_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, directory: str = None, max_disk_bytes: int = None):
+        super().__init__(max_bytes)
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+
+    def _path(self, key: tuple) -> str:
+        shape, w, h, frames = key
+        return os.path.join(self.directory, f"{shape}_{w}x{h}_{frames}.npy")
+
+    def _load_or_generate(self, key: tuple) -> np.ndarray:
+        shape, w, h, frames = key
+        if self.directory is None:
+            return generate_masks(shape, (w, h), frames)
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.save(f, generate_masks(shape, (w, h), frames))
+            os.replace(tmp, path)
+            if self.max_disk_bytes is not None:
+                self.evict(keep=[path])
+        return np.load(path, mmap_mode='r')
+
+    def evict(self, keep: List[str] = ()):
+        # Files this process holds are kept; deleting one mapped by another process is safe on POSIX, and where
+        # the OS refuses it simply stays
+        with self._lock:
+            keep = [*keep, *(self._path(key) for key in self._entries)]
+        paths = [entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.npy')]
+        evict_files(paths, self.max_disk_bytes, keep=keep)
+
+    def get(self, shape: str, size: Tuple[int, int], frames: int) -> np.ndarray:
+        key = (shape, int(size[0]), int(size[1]), int(frames))
+        return self.get_or_build(key, lambda: self._load_or_generate(key))
+
+
+def blend(frame1: np.ndarray, frame2: np.ndarray, alpha: np.ndarray, work: Dict = None) -> np.ndarray:
+    # out = round((frame1 * (255 - a) + frame2 * a) / 255), all in uint16 with no float temporaries
+    if work is None:
+        work = {}
+    shape = frame1.shape
+    if work.get('shape') != shape:
+        work.update(shape=shape, acc=np.empty(shape, np.uint16), tmp=np.empty(shape, np.uint16),
+                    inv=np.empty(shape[:2], np.uint8))
+    acc, tmp, inv = work['acc'], work['tmp'], work['inv']
+    np.subtract(255, alpha, out=inv)
+    np.multiply(frame1, inv[..., None], out=acc, dtype=np.uint16)
+    np.multiply(frame2, alpha[..., None], out=tmp, dtype=np.uint16)
+    acc += tmp
+    acc += 128
+    np.right_shift(acc, 8, out=tmp)
+    acc += tmp
+    acc >>= 8
+    return acc.astype(np.uint8)
+
+
+MASKS = MaskCache(TRANSITION_MASK_CACHE_BYTES, TRANSITION_MASK_DIR, TRANSITION_MASK_DIR_MAX_BYTES)
@@ -0,0 +1,73 @@
+import zlib
+from typing import Callable, Dict
+
+import numpy as np
+
+from config import TEXTURE_CACHE_BYTES, TEXTURE_SEED
+from render.cache import ByteLRU
+
+
+# Generators take (width, height, rng) and return uint8 images; PCG64 streams are stable across
+# platforms and numpy releases, so a given (kind, size, seed) always yields the same bytes
+def noise_texture(w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.integers(0, 256, size=(h, w), dtype=np.uint8)
+
+
+def starfield_texture(w: int, h: int, rng: np.random.Generator, density: float = 0.0015) -> np.ndarray:
+    stars = np.zeros((h, w, 3), np.uint8)
+    count = max(1, int(w * h * density))
+    ys = rng.integers(0, h, count)
+    xs = rng.integers(0, w, count)
+    brightness = rng.integers(96, 256, count, dtype=np.uint8)
+    tint = rng.integers(0, 40, (count, 3), dtype=np.uint8)
+    color = np.clip(brightness[:, None].astype(np.int16) - tint, 0, 255).astype(np.uint8)
+    stars[ys, xs] = color
+    # A few brighter stars get a 2x2 footprint
+    big = brightness > 240
+    stars[np.minimum(ys[big] + 1, h - 1), xs[big]] = color[big]
+    stars[ys[big], np.minimum(xs[big] + 1, w - 1)] = color[big]
+    return stars
+
+
+def light_leak_texture(w: int, h: int, rng: np.random.Generator, blobs: int = 5) -> np.ndarray:
+    # Warm gaussian blobs, each built as an outer product of two 1-D profiles
+    leak = np.zeros((h, w, 3), np.float32)
+    x = np.arange(w, dtype=np.float32)
+    y = np.arange(h, dtype=np.float32)
+    warm = np.array([[255, 140, 40], [255, 90, 60], [255, 200, 110], [240, 60, 90]], np.float32)
+    for _ in range(blobs):
+        cx, cy = rng.uniform(0, w), rng.uniform(-0.2 * h, 1.2 * h)
+        sx, sy = rng.uniform(0.1, 0.3) * w, rng.uniform(0.3, 0.8) * h
+        profile = np.outer(np.exp(-((y - cy) / sy) ** 2), np.exp(-((x - cx) / sx) ** 2))
+        leak += profile[..., None] * warm[rng.integers(0, len(warm))] * rng.uniform(0.5, 1.0)
+    return np.clip(leak, 0, 255).astype(np.uint8)
+
+
+TEXTURES: Dict[str, Callable[[int, int, np.random.Generator], np.ndarray]] = {
+    'noise': noise_texture,
+    'starfield': starfield_texture,
+    'light_leak': light_leak_texture,
+}
+
+
+class TextureStore(ByteLRU):
+    """Seeded procedural textures generated once per (kind, resolution, seed) and handed out read-only,
+    so callers share the same buffer instead of copying it."""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, seed: int = 0):
+        super().__init__(max_bytes)
+        self.seed = seed
+
+    def get(self, kind: str, width: int, height: int, seed: int = None) -> np.ndarray:
+        seed = self.seed if seed is None else seed
+        key = (kind, int(width), int(height), seed)
+        return self.get_or_build(key, lambda: self._generate(kind, key[1], key[2], seed))
+
+    @staticmethod
+    def _generate(kind: str, width: int, height: int, seed: int) -> np.ndarray:
+        texture = TEXTURES[kind](width, height, np.random.default_rng([seed, zlib.crc32(kind.encode())]))
+        texture.flags.writeable = False
+        return texture
+
+
+TEXTURE_STORE = TextureStore(TEXTURE_CACHE_BYTES, TEXTURE_SEED)
@@ -1,22 +1,42 @@
-from moviepy.editor import VideoFileClip, CompositeVideoClip, concatenate_videoclips, vfx, clips_array
-from moviepy.video.fx import scroll, fadein, fadeout, mask_color
+import os
+import tempfile
+from moviepy.editor import VideoClip, VideoFileClip, CompositeVideoClip, CompositeAudioClip, concatenate_videoclips, vfx
+from moviepy.video.fx import scroll, fadein, fadeout
 import numpy as np
 
+from effects.warps import resize_clip, rotate_table, warp_clip, zoom_table
+from profiling.tracer import TRACER
+from render.profiles import write_kwargs
+from transitions.masks import MASKS, blend
+from transitions.textures import TEXTURE_STORE
+
 class TransitionEffects:
     @staticmethod
-    def apply_transition(clip1_path, clip2_path, transition_name, **kwargs):
-        clip1 = VideoFileClip(clip1_path).resize(height=720)
-        clip2 = VideoFileClip(clip2_path).resize(height=720)
-        
+    def apply_transition(clip1_path, clip2_path, transition_name, duration=1, output_path=None,
+                         profile="intermediate-lossless-fast", **kwargs):
         transition_method = getattr(TransitionEffects, transition_name, None)
         if not transition_method:
             raise ValueError(f"Unknown transition: {transition_name}")
-        
-        final_clip = transition_method(clip1, clip2, **kwargs)
-        
-        output_file = f"{transition_name}.mp4"
-        final_clip.write_videofile(output_file, codec="libx264")
-        return output_file
+
+        # Only the overlap window is rendered: the tail of clip1 and the head of clip2
+        clip1 = VideoFileClip(clip1_path)
+        clip2 = VideoFileClip(clip2_path)
+        tail = clip1.subclip(max(0, clip1.duration - duration))
+        head = clip2.subclip(0, min(duration, clip2.duration))
+        if head.size != tail.size:
+            head = resize_clip(head, tail.size)
+
+        final_clip = TRACER.sample_frames(transition_method(tail, head, duration=duration, **kwargs), f"transition.{transition_name}")
+
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(prefix=f"{transition_name}_", suffix=".mp4")
+            os.close(fd)
+        with TRACER.span('transition.encode', transition=transition_name, profile=profile) as span:
+            final_clip.write_videofile(output_path, logger=None, **write_kwargs(profile))
+            span.add(frames=int(final_clip.duration * final_clip.fps), bytes_written=os.path.getsize(output_path))
+        clip1.close()
+        clip2.close()
+        return output_path
 
     @staticmethod
     def a_roll_transition(clip1, clip2, duration=1):
@@ -24,9 +44,9 @@ class TransitionEffects:
         return concatenate_videoclips([clip1, transition, clip2], method="compose")
 
     @staticmethod
-    def b_roll_transition(clip1, clip2, start_time=5, duration=2):
+    def b_roll_transition(clip1, clip2, start_time=0, duration=1):
         b_roll_clip = clip2.subclip(start_time, start_time + duration)
-        b_roll_clip = b_roll_clip.set_position(("center", "center")).resize(clip1.size)
+        b_roll_clip = resize_clip(b_roll_clip, clip1.size).set_position(("center", "center"))
         return CompositeVideoClip([clip1, b_roll_clip])
 
     @staticmethod
@@ -36,9 +56,9 @@ class TransitionEffects:
         return concatenate_videoclips([clip1, clip2], method="compose")
 
     @staticmethod
-    def fade_transition(clip1, clip2, fade_duration=1):
-        clip1 = clip1.fx(vfx.fadeout, fade_duration)
-        clip2 = clip2.fx(vfx.fadein, fade_duration)
+    def fade_transition(clip1, clip2, duration=1):
+        clip1 = clip1.fx(vfx.fadeout, duration)
+        clip2 = clip2.fx(vfx.fadein, duration)
         return concatenate_videoclips([clip1, clip2], method="compose")
 
     @staticmethod
@@ -53,34 +73,46 @@ class TransitionEffects:
         return concatenate_videoclips([clip1, transition, clip2], method="compose")
 
     @staticmethod
-    def zoom_transition(clip1, clip2, zoom_duration=1):
-        zoom_in = vfx.resize(clip1, lambda t: 1 + 0.1 * (t / zoom_duration)).set_duration(zoom_duration)
-        zoom_out = vfx.resize(clip2, lambda t: 1 + 0.1 * ((zoom_duration - t) / zoom_duration)).set_duration(zoom_duration)
+    def zoom_transition(clip1, clip2, duration=1):
+        # Zoom tables are quantised per frame, so every boundary of the same size reuses them
+        zoom_in = warp_clip(clip1, "zoom", lambda t: zoom_table(clip1.size, 1 + 0.1 * (t / duration)))
+        zoom_out = warp_clip(clip2, "zoom", lambda t: zoom_table(clip2.size, 1 + 0.1 * ((duration - t) / duration)))
+        zoom_in, zoom_out = zoom_in.set_duration(duration), zoom_out.set_duration(duration)
         return concatenate_videoclips([zoom_in, zoom_out], method="compose")
 
+    @staticmethod
+    def _masked_transition(clip1, clip2, shape, duration=1):
+        # Shape transitions share one precomputed alpha family per (shape, size, frame count);
+        # each output frame is a single vectorized blend of the two overlapping frames
+        duration = min(duration, clip1.duration, clip2.duration)
+        fps = clip1.fps or clip2.fps or 25
+        frames = max(1, int(round(duration * fps)))
+        masks = MASKS.get(shape, clip1.size, frames)
+        work = {}
+        blend_frame = TRACER.frame_hook(f"kernel.blend_{shape}", blend)
+
+        def make_frame(t):
+            k = min(int(t * fps), frames - 1)
+            return blend_frame(clip1.get_frame(t), clip2.get_frame(t), masks[k], work)
+
+        return TransitionEffects._procedural_transition(clip1, clip2, make_frame, duration)
+
+    @staticmethod
+    def _procedural_transition(clip1, clip2, make_frame, duration=1):
+        duration = min(duration, clip1.duration, clip2.duration)
+        transition = VideoClip(make_frame, duration=duration).set_fps(clip1.fps or clip2.fps or 25)
+        audio = [a for a in (clip1.audio, clip2.audio) if a is not None]
+        if audio:
+            transition = transition.set_audio(CompositeAudioClip(audio).set_duration(duration))
+        return transition
+
     @staticmethod
     def split_transition(clip1, clip2, duration=1):
-        def make_split_transition(clip1, clip2, duration):
-            w, h = clip1.size
-            num_splits = 4
-            clips = []
-            for i in range(num_splits):
-                start_pos = int(i * (w / num_splits))
-                end_pos = int((i + 1) * (w / num_splits))
-                part1 = clip1.crop(x1=start_pos, x2=end_pos).set_position((start_pos, 0))
-                part2 = clip2.crop(x1=start_pos, x2=end_pos).set_position((start_pos, 0))
-                clips.append(part1)
-                clips.append(part2.set_start(duration / 2))
-            return clips_array([clips])
-        return make_split_transition(clip1, clip2, duration)
-
-    @staticmethod
-    def circle_reveal_transition(clip1, clip2, radius=200, duration=1):
-        def circle_mask(clip, radius, t):
-            return clip.fx(vfx.mask_color, color=(0, 0, 0), thr=0.3).fx(vfx.circle_mask, radius=radius * t / duration)
-        mask1 = clip1.fx(circle_mask, radius=radius, t=0).set_duration(duration)
-        mask2 = clip2.fx(circle_mask, radius=radius, t=duration).set_duration(duration)
-        return CompositeVideoClip([mask1, mask2.set_start(duration / 2)], size=clip1.size)
+        return TransitionEffects._masked_transition(clip1, clip2, 'split', duration)
+
+    @staticmethod
+    def circle_reveal_transition(clip1, clip2, duration=1):
+        return TransitionEffects._masked_transition(clip1, clip2, 'circle', duration)
 
     @staticmethod
     def page_turn_transition(clip1, clip2, duration=1):
@@ -90,9 +122,22 @@ class TransitionEffects:
         return CompositeVideoClip([page_turn, clip2.set_start(duration / 2)], size=clip1.size)
 
     @staticmethod
-    def light_leak_transition(clip1, clip2, leak_duration=1):
-        light_leak = VideoFileClip("light_leak.mp4").resize(clip1.size).set_duration(leak_duration)
-        return concatenate_videoclips([clip1, light_leak, clip2], method="compose")
+    def light_leak_transition(clip1, clip2, duration=1):
+        # Crossfade under a procedural leak that sweeps across the frame and peaks mid-transition
+        duration = min(duration, clip1.duration, clip2.duration)
+        w, h = clip1.size
+        leak = TEXTURE_STORE.get('light_leak', 2 * w, h)
+        work = {}
+
+        def overlay(t):
+            progress = t / duration
+            alpha = np.broadcast_to(np.uint8(round(255 * progress)), (h, w))
+            frame = blend(clip1.get_frame(t), clip2.get_frame(t), alpha, work).astype(np.uint16)
+            offset = int((w - 1) * (1 - progress))
+            frame += (leak[:, offset:offset + w] * np.sin(np.pi * progress)).astype(np.uint16)
+            return np.minimum(frame, 255).astype(np.uint8)
+
+        return TransitionEffects._procedural_transition(clip1, clip2, overlay, duration)
 
     @staticmethod
     def inverted_colors_transition(clip1, clip2, duration=1):
@@ -107,62 +152,49 @@ class TransitionEffects:
                                    fade_clip2.set_start(duration - fade_clip2.duration)])
 
     @staticmethod
-    def rotate_transition(clip1, clip2, rotation_duration=1):
-        def rotate_effect(t):
-            return clip1.fx(vfx.rotate, angle=360 * (t / rotation_duration)).set_duration(rotation_duration)
-        rotating_clip = rotate_effect(rotation_duration)
-        return CompositeVideoClip([rotating_clip, clip2.set_start(rotation_duration / 2)], size=clip1.size)
+    def rotate_transition(clip1, clip2, duration=1):
+        # clip2 covers the whole frame from halfway on, so only the first half of the rotation is ever seen
+        rotating_clip = warp_clip(clip1, "rotate", lambda t: rotate_table(clip1.size, 360 * (t / duration)))
+        rotating_clip = rotating_clip.set_duration(duration / 2)
+        return CompositeVideoClip([rotating_clip, clip2.set_start(duration / 2)], size=clip1.size)
 
     @staticmethod
-    def diagonal_wipe_transition(clip1, clip2, wipe_duration=1):
-        def diagonal_wipe(t):
-            return vfx.crop(clip1, x1=0, x2=clip1.size[0] * t / wipe_duration,
-                            y1=0, y2=clip1.size[1] * t / wipe_duration).set_duration(wipe_duration)
-        wipe_clip = diagonal_wipe(wipe_duration)
-        return CompositeVideoClip([wipe_clip, clip2.set_start(wipe_duration / 2)], size=clip1.size)
+    def diagonal_wipe_transition(clip1, clip2, duration=1):
+        return TransitionEffects._masked_transition(clip1, clip2, 'diagonal', duration)
 
     @staticmethod
     def heart_shape_transition(clip1, clip2, duration=1):
-        from moviepy.video.tools.drawing import color_gradient
-        
-        def heart_shape(size, t):
-            mask = np.zeros(size)
-            x = np.linspace(-1, 1, size[1])
-            y = np.linspace(-1, 1, size[0])
-            X, Y = np.meshgrid(x, y)
-            equation = (X**2 + (Y - np.sqrt(abs(X)))**2 - 1)**3 - X**2 * (Y**2)**3
-            mask[equation < 0] = 1
-            return mask
-        
-        mask_clip = color_gradient(clip1.size, p1=(0, 0), p2=(1, 1), color1=(0, 0, 0), color2=(1, 0, 0))
-        mask_clip = mask_clip.fx(mask_color, color=(0, 0, 0)).fx(lambda clip: clip.set_duration(duration))
-        
-        heart_mask = heart_shape(clip1.size, duration)
-        heart_mask_clip = VideoFileClip.from_array(heart_mask).set_duration(duration)
-        
-        return CompositeVideoClip([clip1.set_opacity(heart_mask_clip.fx(vfx.colorx, 0.5)), 
-                                   clip2.set_start(duration / 2).set_opacity(heart_mask_clip)], 
-                                  size=clip1.size)
-
-    @staticmethod
-    def film_roll_transition(clip1, clip2, roll_duration=1):
+        return TransitionEffects._masked_transition(clip1, clip2, 'heart', duration)
+
+    @staticmethod
+    def film_roll_transition(clip1, clip2, duration=1):
         def roll_effect(t):
-            return vfx.scroll(clip1, y_speed=-clip1.size[1] * (t / roll_duration)).set_duration(roll_duration)
-        rolling_clip = roll_effect(roll_duration)
-        return CompositeVideoClip([rolling_clip, clip2.set_start(roll_duration / 2)], size=clip1.size)
+            return vfx.scroll(clip1, y_speed=-clip1.size[1] * (t / duration)).set_duration(duration)
+        rolling_clip = roll_effect(duration)
+        return CompositeVideoClip([rolling_clip, clip2.set_start(duration / 2)], size=clip1.size)
 
     @staticmethod
-    def ripple_transition(clip1, clip2, ripple_duration=1):
+    def ripple_transition(clip1, clip2, duration=1):
         def ripple_effect(t):
-            return vfx.ripple(clip1, frequency=10, amplitude=20 * (t / ripple_duration)).set_duration(ripple_duration)
-        ripple_clip = ripple_effect(ripple_duration)
-        return CompositeVideoClip([ripple_clip, clip2.set_start(ripple_duration / 2)], size=clip1.size)
-
-    @staticmethod
-    def starfield_transition(clip1, clip2, starfield_duration=1):
-        def starfield_effect(t):
-            stars = np.random.rand(clip1.size[1], clip1.size[0]) * 255
-            starfield = VideoFileClip.from_array(stars.astype(np.uint8)).set_duration(starfield_duration)
-            return CompositeVideoClip([starfield, clip1.set_opacity(0.5)])
-        final_clip = starfield_effect(starfield_duration)
-        return CompositeVideoClip([final_clip, clip2.set_start(starfield_duration / 2)], size=clip1.size)
+            return vfx.ripple(clip1, frequency=10, amplitude=20 * (t / duration)).set_duration(duration)
+        ripple_clip = ripple_effect(duration)
+        return CompositeVideoClip([ripple_clip, clip2.set_start(duration / 2)], size=clip1.size)
+
+    @staticmethod
+    def starfield_transition(clip1, clip2, duration=1):
+        # clip1 fades into a static star field, which then fades into clip2
+        duration = min(duration, clip1.duration, clip2.duration)
+        w, h = clip1.size
+        stars = TEXTURE_STORE.get('starfield', w, h)
+        half = duration / 2
+        work = {}
+
+        def starfield(t):
+            if t < half:
+                frame1, frame2, progress = clip1.get_frame(t), stars, t / half
+            else:
+                frame1, frame2, progress = stars, clip2.get_frame(t), (t - half) / half
+            alpha = np.broadcast_to(np.uint8(round(255 * min(progress, 1))), (h, w))
+            return blend(frame1, frame2, alpha, work)
+
+        return TransitionEffects._procedural_transition(clip1, clip2, starfield, duration)
@@ -0,0 +1,51 @@
+import threading
+from typing import List
+
+
+class TranslationBackend:
+    """Translates a batch of texts; returns one translation per input, in order."""
+
+    name = 'base'
+
+    def translate(self, texts: List[str], dest: str, src: str = 'auto') -> List[str]:
+        raise NotImplementedError
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    name = 'google'
+
+    def __init__(self, service_urls: List[str] = None):
+        self.service_urls = service_urls
+        # googletrans keeps an HTTP session per Translator, which worker threads shouldn't share
+        self._local = threading.local()
+
+    def _translator(self):
+        translator = getattr(self._local, 'translator', None)
+        if translator is None:
+            from googletrans import Translator
+            translator = Translator(service_urls=self.service_urls) if self.service_urls else Translator()
+            self._local.translator = translator
+        return translator
+
+    def translate(self, texts: List[str], dest: str, src: str = 'auto') -> List[str]:
+        return [result.text for result in self._translator().translate(texts, dest=dest, src=src)]
+
+
+class IdentityBackend(TranslationBackend):
+    # Returns the text unchanged: offline runs, sources already in the target language, and tests
+    name = 'identity'
+
+    def translate(self, texts: List[str], dest: str, src: str = 'auto') -> List[str]:
+        return list(texts)
+
+
+BACKENDS = {
+    'google': GoogleTranslateBackend,
+    'identity': IdentityBackend,
+}
+
+
+def get_backend(name: str, **kwargs) -> TranslationBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translation backend: {name}")
+    return BACKENDS[name](**kwargs)
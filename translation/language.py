@@ -0,0 +1,58 @@
+import re
+from typing import Dict
+
+# Frequent function words; a text written in one of these languages is dense with its own and sparse in the others'
+STOPWORDS = {
+    'en': {'the', 'and', 'is', 'are', 'was', 'of', 'to', 'in', 'that', 'it', 'you', 'this', 'for', 'with', 'have',
+           'we', 'on', 'not', 'be', 'they', 'what', 'so', 'but', 'just', 'can', 'do', 'my', 'about'},
+    'es': {'el', 'la', 'los', 'las', 'de', 'que', 'y', 'en', 'es', 'un', 'una', 'por', 'con', 'para', 'no', 'se',
+           'lo', 'del', 'pero', 'muy', 'como', 'esto', 'está', 'son', 'yo', 'más'},
+    'fr': {'le', 'la', 'les', 'de', 'des', 'et', 'est', 'un', 'une', 'que', 'qui', 'pour', 'dans', 'pas', 'sur',
+           'avec', 'ce', 'il', 'je', 'nous', 'vous', 'mais', 'très', 'du', 'au', 'sont'},
+    'de': {'der', 'die', 'das', 'und', 'ist', 'nicht', 'ein', 'eine', 'zu', 'mit', 'auf', 'für', 'von', 'den', 'dem',
+           'ich', 'wir', 'sie', 'es', 'aber', 'auch', 'sehr', 'sind', 'wie', 'noch', 'dass'},
+    'it': {'il', 'lo', 'la', 'gli', 'le', 'di', 'che', 'e', 'è', 'un', 'una', 'per', 'con', 'non', 'sono', 'del',
+           'della', 'ma', 'molto', 'questo', 'come', 'anche', 'io', 'noi', 'nel', 'alla'},
+    'pt': {'o', 'a', 'os', 'as', 'de', 'que', 'e', 'é', 'um', 'uma', 'para', 'com', 'não', 'do', 'da', 'em', 'no',
+           'na', 'mas', 'muito', 'isso', 'como', 'eu', 'nós', 'são', 'você'},
+    'nl': {'de', 'het', 'een', 'en', 'van', 'is', 'dat', 'niet', 'op', 'te', 'met', 'voor', 'zijn', 'ik', 'we',
+           'maar', 'ook', 'heel', 'dit', 'wat', 'er', 'naar', 'als', 'nog', 'je', 'wordt'},
+}
+
+# Languages recognised by their script alone
+SCRIPTS = {
+    'ru': r'[Ѐ-ӿ]', 'uk': r'[Ѐ-ӿ]', 'el': r'[Ͱ-Ͽ]', 'ar': r'[؀-ۿ]',
+    'he': r'[֐-׿]', 'hi': r'[ऀ-ॿ]', 'th': r'[฀-๿]', 'ko': r'[가-힯]',
+    'ja': r'[぀-ヿ]', 'zh': r'[一-鿿]', 'zh-cn': r'[一-鿿]', 'zh-tw': r'[一-鿿]',
+}
+
+WORD = re.compile(r"[^\W\d_]+")
+
+MIN_WORDS = 8  # Too few words to tell languages apart by their function words
+
+
+def stopword_ratios(text: str) -> Dict[str, float]:
+    words = [w.lower() for w in WORD.findall(text)]
+    if not words:
+        return {}
+    return {language: sum(w in stopwords for w in words) / len(words) for language, stopwords in STOPWORDS.items()}
+
+
+def looks_like(text: str, language: str, min_ratio: float = 0.15) -> bool:
+    """Whether text is clearly written in language already, judged locally without a detection request.
+
+    Only answers yes when the evidence is plain: most letters in the language's own script, or its function words
+    both frequent and ahead of every other listed language's. Anything uncertain goes to the translator.
+    """
+    language = language.lower()
+    letters = WORD.findall(text)
+    if not letters:
+        return True
+    if language in SCRIPTS:
+        chars = ''.join(letters)
+        return len(re.findall(SCRIPTS[language], chars)) / len(chars) >= 0.6
+    if language not in STOPWORDS or len(letters) < MIN_WORDS:
+        return False
+    ratios = stopword_ratios(text)
+    own = ratios.pop(language)
+    return own >= min_ratio and all(own > 1.5 * other for other in ratios.values())
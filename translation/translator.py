@@ -0,0 +1,132 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from llm.cache import ResponseCache
+from profiling.tracer import TRACER
+from translation.backends import TranslationBackend
+from translation.language import looks_like
+
+SENTENCE_END = re.compile(r'(?<=[.!?。！？])\s+')
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    # Sentence boundaries first; a sentence that alone is over the limit is cut between words
+    pieces, current = [], ''
+    for sentence in SENTENCE_END.split(' '.join(text.split())):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ''
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class ChunkedTranslator:
+    """Translates transcripts in size-bounded chunks, concurrently, with chunk-level results cached on disk.
+
+    Speech segments are packed in order into chunks of at most max_chars, one segment per line, so a request carries
+    many segments and each translated line maps back to its segment and timestamps. A segment longer than max_chars
+    is split at sentence boundaries first. Chunks that already read as the target language are passed through
+    without a request.
+    """
+
+    def __init__(self, backend: TranslationBackend, cache: Optional[ResponseCache] = None, max_chars: int = 4500,
+                 max_workers: int = 4, src: str = 'auto'):
+        self.backend = backend
+        self.cache = cache
+        self.max_chars = max_chars
+        self.max_workers = max_workers
+        self.src = src
+        self.requests = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def chunk(self, texts: List[str]) -> List[List[tuple]]:
+        # Each chunk is a list of (text index, piece) lines
+        chunks, current, size = [], [], 0
+        for i, text in enumerate(texts):
+            for piece in split_text(text, self.max_chars) if text and text.strip() else []:
+                if current and size + 1 + len(piece) > self.max_chars:
+                    chunks.append(current)
+                    current, size = [], 0
+                current.append((i, piece))
+                size += len(piece) + (1 if size else 0)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _key(self, text: str, dest: str) -> str:
+        return ResponseCache.make_key('translate', self.backend.name, self.src, dest, text)
+
+    def _translate_lines(self, lines: List[str], dest: str) -> List[str]:
+        text = '\n'.join(lines)
+        cached = self.cache.get(self._key(text, dest)) if self.cache else None
+        if cached is not None:
+            TRACER.count('translation_cache.hit')
+            return cached.split('\n')
+        if self.cache:
+            TRACER.count('translation_cache.miss')
+        with TRACER.span('translate.request', 'network') as span:
+            span.add(characters=len(text))
+            with self._lock:
+                self.requests += 1
+            translated = self.backend.translate([text], dest=dest, src=self.src)[0]
+        # Line breaks usually survive translation; when they don't, the lines go one request each
+        result = translated.split('\n')
+        if len(result) != len(lines):
+            if len(lines) == 1:
+                result = [translated.replace('\n', ' ')]
+            else:
+                result = [self._translate_lines([line], dest)[0] for line in lines]
+        if self.cache:
+            self.cache.put(self._key(text, dest), '\n'.join(result))
+        return result
+
+    def _translate_chunk(self, chunk: List[tuple], dest: str) -> List[str]:
+        lines = [piece for _, piece in chunk]
+        if looks_like('\n'.join(lines), dest):
+            with self._lock:
+                self.skipped += 1
+            return lines
+        try:
+            return self._translate_lines(lines, dest)
+        except Exception as e:
+            # One failed chunk keeps its original text rather than failing the whole transcript
+            logging.error(f"Error translating chunk of {len(lines)} lines: {e}")
+            return lines
+
+    def translate_texts(self, texts: List[str], dest: str) -> List[str]:
+        chunks = self.chunk(texts)
+        translated: Dict[int, List[str]] = {}
+        started = time.perf_counter()
+        requests, skipped = self.requests, self.skipped
+        with TRACER.span('translate', dest=dest) as span, ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            span.add(chunks=len(chunks), characters=sum(len(text or '') for text in texts))
+            translate = TRACER.bind(self._translate_chunk)
+            for chunk, lines in zip(chunks, pool.map(lambda c: translate(c, dest), chunks)):
+                for (i, _), line in zip(chunk, lines):
+                    translated.setdefault(i, []).append(line.strip())
+        logging.info(f"Translated {len(texts)} texts in {len(chunks)} chunks in {time.perf_counter() - started:.1f}s "
+                     f"({self.requests - requests} requests, {self.skipped - skipped} already in '{dest}')")
+        return [' '.join(translated[i]) if i in translated else (text or '') for i, text in enumerate(texts)]
+
+    def translate_segments(self, segments: List[Dict], dest: str) -> List[Dict]:
+        # Same segments with translated text; start/end (and the original text) are kept for alignment
+        texts = self.translate_texts([segment.get('text', '') for segment in segments], dest)
+        return [dict(segment, text=text, source_text=segment.get('text', '')) for segment, text in zip(segments, texts)]
+
+    def translate_text(self, text: str, dest: str) -> str:
+        return self.translate_texts([text], dest)[0]
@@ -1,44 +1,119 @@
+import argparse
 import os
+import time
 import moviepy.editor as mp
-import speech_recognition as sr
-from googletrans import Translator
-from llm.llama import LLM
+from llm.cache import ResponseCache
+from llm.llama import LLM, LLM_batch, cache as llm_cache, client as llm_client
+from llm.context import ConversationContext
 import logging
 import re
 import json
 import random
-from transitions import transitions
-from typing import List, Dict
+from transitions.transitions import TransitionEffects
+from typing import List, Dict, Optional
 from effects.effects import VideoEffects
+from edl.edl import EditDecisionList
+from media.index import SeekIndex, load_index, open_indexed
+from media.proxy import ensure_proxy
+from media.source import MediaSource
+from profiling.tracer import TRACER
+from render.cache import RenderCache
+from render.profiles import get_profile, write_kwargs
+from render.segments import SegmentRenderer
+from render.assembly import assemble_timeline
+from selection.selector import HeuristicSelector, parse_refinement, refinement_prompt
+from selection.signals import FrameSignals, boundary_signals, segment_signals
+from speech.backends import SpeechBackend, get_backend
+from speech.transcriber import ChunkedTranscriber
+from translation.backends import get_backend as get_translation_backend
+from translation.translator import ChunkedTranslator
 
-from config import VIDEO_PATH, AUDIO_PATH, OUTPUT_DIR, TRANSITIONS_FILE, EFFECTS_FILE
+from config import (VIDEO_PATH, OUTPUT_DIR, TRANSITIONS_FILE, EFFECTS_FILE, SPEECH_BACKEND, TRANSCRIBE_SAMPLE_RATE,
+                    TRANSCRIBE_WINDOW_SECONDS, TRANSCRIBE_OVERLAP_SECONDS, TRANSCRIBE_SILENCE_THRESHOLD, TRANSCRIBE_WORKERS,
+                    TRANSLATE_LANGUAGE, TRANSLATE_BACKEND, TRANSLATE_CHUNK_CHARS, TRANSLATE_WORKERS, TRANSLATE_CACHE_PATH,
+                    TRANSLATE_CACHE_MAX_ENTRIES,
+                    LLM_CONTEXT_TOKEN_BUDGET, RENDER_WORKERS, RENDER_THREADS_PER_ENCODER, RENDER_MAX_RETRIES, SMART_RENDER,
+                    INTERMEDIATE_PROFILE, RENDER_PROFILE, PREVIEW_HEIGHT, PREVIEW_FPS, PREVIEW_PROFILE, PROXY_DIR, EDIT_PLAN_FILE, RENDER_CACHE_DIR,
+                    RENDER_CACHE_MAX_BYTES, TRANSITION_DURATION, TOPIC_KEYFRAME_SNAP, EDIT_SELECTOR, SELECTOR_SAMPLE_FPS, TRACE_FILE, TRACE_CHROME_FILE, setup_logging)
 
 class VideoProcessor:
-    def __init__(self):
-        self.translator = Translator()
-        self.setup_logging()
+    def __init__(self, speech_backend: SpeechBackend = None, video_path: str = VIDEO_PATH, output_dir: str = OUTPUT_DIR,
+                 scratch_dir: str = None):
+        self.video_path = video_path
+        self.output_dir = output_dir
+        # Moviepy's temporary audio tracks go here instead of the working directory, so concurrent jobs can't collide
+        self.scratch_dir = scratch_dir or os.path.join(output_dir, "scratch")
+        self.translator = ChunkedTranslator(
+            get_translation_backend(TRANSLATE_BACKEND),
+            cache=ResponseCache(TRANSLATE_CACHE_PATH, max_entries=TRANSLATE_CACHE_MAX_ENTRIES),
+            max_chars=TRANSLATE_CHUNK_CHARS,
+            max_workers=TRANSLATE_WORKERS,
+        )
+        self.transcriber = ChunkedTranscriber(
+            speech_backend or get_backend(SPEECH_BACKEND),
+            window_seconds=TRANSCRIBE_WINDOW_SECONDS,
+            overlap_seconds=TRANSCRIBE_OVERLAP_SECONDS,
+            silence_threshold=TRANSCRIBE_SILENCE_THRESHOLD,
+            max_workers=TRANSCRIBE_WORKERS,
+        )
+        self.renderer = SegmentRenderer(RENDER_WORKERS, RENDER_THREADS_PER_ENCODER, RENDER_MAX_RETRIES, SMART_RENDER)
+        self.render_cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
+        self.reset_llm_context()
 
-    def setup_logging(self):
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    def reset_llm_context(self):
+        # One conversation per video job; effect/transition picks are one-shot and carry no history
+        self.llm_context = ConversationContext(token_budget=LLM_CONTEXT_TOKEN_BUDGET)
+        self.classifier_context = ConversationContext(stateless=True)
+
+    def process_video(self, preview: bool = False, reuse_plan: bool = False) -> str:
+        # Planning (transcription, topics, effect/transition picks) and rendering are separate stages: the plan is
+        # saved next to the output as an EDL, so a preview and the final render can share the same decisions
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        plan_path = os.path.join(self.output_dir, EDIT_PLAN_FILE)
+        with TRACER.span('job', source=self.video_path, preview=preview):
+            plan = self.load_plan(plan_path) if reuse_plan else None
+            if plan is None:
+                self.reset_llm_context()
+                with MediaSource(self.video_path, sample_rate=TRANSCRIBE_SAMPLE_RATE) as source:
+                    plan = self.plan_edits(source)
+                if plan is None:
+                    return None
+                self.save_plan(plan, plan_path)
+            return self.render_plan(plan, preview)
+
+    def plan_edits(self, source: MediaSource) -> EditDecisionList:
+        started = time.perf_counter()
+        speech_segments = self.transcribe_segments(source)
+        transcript = ' '.join(segment['text'] for segment in speech_segments if segment['text']).strip()
+        logging.info(f"Transcription stage took {time.perf_counter() - started:.1f}s (no intermediate audio file written)")
 
-    def process_video(self):
-        if not os.path.exists(OUTPUT_DIR):
-            os.makedirs(OUTPUT_DIR)
-        
-        self.extract_audio_from_video(VIDEO_PATH, AUDIO_PATH)
-        transcript, timestamps = self.transcribe_audio_with_timestamps(AUDIO_PATH)
-        
         if not transcript:
             logging.warning("No transcript available, skipping video processing.")
-            return
+            return None
+        return self.plan_from_transcript(transcript, source.path, speech_segments)
 
-        translated_transcript = self.translate_text(transcript)
+    def plan_from_transcript(self, transcript: str, source_path: str, speech_segments: List[Dict] = None) -> EditDecisionList:
+        # The network-bound half of planning: translation, topic split and effect/transition picks.
+        # Timestamped speech segments, when given, feed the pause and keyword signals of the local selector
+        with TRACER.span('plan', source=source_path):
+            return self._plan_from_transcript(transcript, source_path, speech_segments)
+
+    def _plan_from_transcript(self, transcript: str, source_path: str, speech_segments: List[Dict] = None) -> EditDecisionList:
+        # Speech segments are translated one by one, keeping their timestamps, so the selector's keywords match the
+        # translated speech at the right place
+        if speech_segments:
+            speech_segments = self.translate_segments(speech_segments)
+            translated_transcript = ' '.join(segment['text'] for segment in speech_segments if segment['text']).strip()
+        else:
+            translated_transcript = self.translate_text(transcript)
         topics_text = self.divide_transcription_into_topics(translated_transcript)
-        parsed_topics = self.parse_topics(topics_text)
+        parsed_topics = self.parse_topics(topics_text, self._seek_index(source_path) if TOPIC_KEYFRAME_SNAP else None)
         
         if not parsed_topics:
             logging.warning("No valid topics found, skipping video processing.")
-            return
+            return None
 
         transitions_info = self.load_transitions(TRANSITIONS_FILE)
         if not transitions_info:
@@ -48,52 +123,96 @@ class VideoProcessor:
         if not effects_info:
             logging.warning("No effects loaded. Proceeding without effects.")
         
-        video = mp.VideoFileClip(VIDEO_PATH)
-        segments = self.process_video_segments(video, parsed_topics, OUTPUT_DIR, effects_info)
-        self.create_final_video(segments, transitions_info, OUTPUT_DIR)
+        started = time.perf_counter()
+        if EDIT_SELECTOR == 'llm':
+            with TRACER.span('llm.suggestions', topics=len(parsed_topics)):
+                effect_names, transition_names = self.get_edit_suggestions(parsed_topics, effects_info, transitions_info)
+        else:
+            effect_names, transition_names = self.select_edits(parsed_topics, speech_segments, source_path, effects_info,
+                                                               transitions_info, refine=EDIT_SELECTOR == 'heuristic+llm')
+        logging.info(f"Edit suggestions took {time.perf_counter() - started:.1f}s ({llm_client.slept:.1f}s rate-limit wait)")
+        logging.info(f"LLM cache: {llm_cache.stats()}")
+        logging.info(f"LLM prompt tokens: conversation {self.llm_context.stats()}, one-shot {self.classifier_context.stats()}")
+        return EditDecisionList.from_suggestions(source_path, self._fingerprint(source_path), parsed_topics,
+                                                 effect_names, transition_names, TRANSITION_DURATION)
 
-    def extract_audio_from_video(self, video_path: str, audio_path: str):
+    def _fingerprint(self, path: str) -> Dict[str, int]:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def save_plan(self, plan: EditDecisionList, plan_path: str):
+        plan.save(plan_path)
+        logging.info(f"Edit plan saved to {plan_path}")
+
+    def load_plan(self, plan_path: str) -> EditDecisionList:
         try:
-            video = mp.VideoFileClip(video_path)
-            audio = video.audio
-            audio.write_audiofile(audio_path)
-            logging.info(f"Audio extracted to {audio_path}")
-        except IOError as e:
-            logging.error(f"IO Error while extracting audio: {e}")
+            plan = EditDecisionList.load(plan_path)
         except Exception as e:
-            logging.error(f"Unexpected error while extracting audio: {e}")
+            logging.info(f"No reusable edit plan at {plan_path} ({e})")
+            return None
+        if plan.source != self.video_path or plan.fingerprint != self._fingerprint(self.video_path):
+            logging.info(f"Edit plan at {plan_path} was made for a different source; planning again")
+            return None
+        logging.info(f"Reusing edit plan from {plan_path}")
+        return plan
 
-    def transcribe_audio_with_timestamps(self, audio_path: str) -> tuple[str, List[tuple[float, float]]]:
-        recognizer = sr.Recognizer()
-        transcript = ""
-        timestamps = []
+    def render_plan(self, plan: EditDecisionList, preview: bool = False) -> str:
+        # A preview renders the same decisions from a cached low-res, low-fps proxy with the fast preview profile.
+        # Segments and transitions are stored in the render cache under the hash of their EDL entry, the source
+        # content and the encoder settings, so a re-render only encodes the entries that changed (a changed
+        # segment also re-renders the transitions on either side of it)
+        transitions_info = self.load_transitions(TRANSITIONS_FILE)
+        effects_info = self.load_effects(EFFECTS_FILE)
+        if preview:
+            source_path = ensure_proxy(plan.source, PREVIEW_HEIGHT, PREVIEW_FPS, PROXY_DIR)
+            output_dir = os.path.join(self.output_dir, "preview")
+            final_profile, proxy = PREVIEW_PROFILE, [PREVIEW_HEIGHT, PREVIEW_FPS]
+        else:
+            source_path, output_dir = plan.source, self.output_dir
+            final_profile, proxy = RENDER_PROFILE, None
+        # Profile settings are part of the key, so retuning a profile doesn't serve stale renders
+        encoder = {'profile': get_profile(INTERMEDIATE_PROFILE), 'proxy': proxy, 'smart': SMART_RENDER}
+        os.makedirs(output_dir, exist_ok=True)
+        digest = self.render_cache.source_digest(plan.source)
+        segment_keys = [plan.segment_key(i, encoder, digest) for i in range(len(plan.segments))]
+        transition_keys = [plan.transition_key(i, encoder, digest) for i in range(len(plan.transitions))]
 
+        started = time.perf_counter()
+        video = open_indexed(source_path)
         try:
-            with sr.AudioFile(audio_path) as source:
-                audio = recognizer.record(source)
-            response = recognizer.recognize_google_cloud(audio, show_all=True)
-            results = response.get('results', [])
-            for result in results:
-                alternatives = result.get('alternatives', [])
-                for alternative in alternatives:
-                    transcript += alternative.get('transcript', '') + ' '
-                    # Append timestamp info if available
-                    if 'timestamp' in alternative:
-                        timestamps.append((alternative['timestamp'][0], alternative['timestamp'][1]))
-            logging.info(f"Transcription completed. Detected language: {response.get('language', 'Unknown')}")
-        except sr.UnknownValueError:
-            logging.warning("Google Cloud Speech API could not understand audio")
-        except sr.RequestError as e:
-            logging.error(f"Could not request results from Google Cloud Speech API; {e}")
+            with TRACER.span('render', source=source_path, preview=preview), \
+                    self.render_cache.pin(segment_keys + transition_keys):
+                segments = self.process_video_segments(video, plan.segments, output_dir, effects_info,
+                                                       [segment['effect'] for segment in plan.segments], INTERMEDIATE_PROFILE,
+                                                       segment_keys)
+                transition_names = [transition['name'] if transition else None for transition in plan.transitions]
+                transition_kwargs = [transition.get('kwargs', {}) if transition else {} for transition in plan.transitions]
+                # The plan's own overlap, not the current config's: it is what the transition keys were hashed with
+                output_file = self.create_final_video(segments, transitions_info, output_dir, transition_names,
+                                                      final_profile, transition_keys, plan.transition_duration,
+                                                      transition_kwargs)
+        finally:
+            video.close()
+        logging.info(f"{'Preview' if preview else 'Render'} stage took {time.perf_counter() - started:.1f}s")
+        logging.info(f"Render cache: {self.render_cache.stats()}")
+        return output_file
+
+    def transcribe_segments(self, source: MediaSource) -> List[Dict]:
+        segments = self.transcriber.transcribe(source)
+        logging.info(f"Transcription completed: {len(segments)} segments")
+        return segments
+
+    def transcribe_audio_with_timestamps(self, source: MediaSource) -> tuple[str, List[tuple[float, float]]]:
+        segments = self.transcribe_segments(source)
+        transcript = ' '.join(segment['text'] for segment in segments if segment['text'])
+        timestamps = [(segment['start'], segment['end']) for segment in segments]
         return transcript.strip(), timestamps
 
-    def translate_text(self, text: str, dest_language: str = 'en') -> str:
-        try:
-            translations = self.translator.translate([text], dest=dest_language)
-            return ' '.join([translation.text for translation in translations])
-        except Exception as e:
-            logging.error(f"Error in translation: {e}")
-            return text
+    def translate_text(self, text: str, dest_language: str = TRANSLATE_LANGUAGE) -> str:
+        return self.translator.translate_text(text, dest_language)
+
+    def translate_segments(self, segments: List[Dict], dest_language: str = TRANSLATE_LANGUAGE) -> List[Dict]:
+        return self.translator.translate_segments(segments, dest_language)
 
     def divide_transcription_into_topics(self, transcript: str) -> str:
         prompt = (
@@ -108,13 +227,23 @@ class VideoProcessor:
             f"Transcript follows:\n\n{transcript}"
         )
         try:
-            response = LLM(prompt)
+            with TRACER.span('llm.topics'):
+                response = LLM(prompt, self.llm_context)
             return response
         except Exception as e:
             logging.error(f"Error from LLM API: {e}")
             return ""
 
-    def parse_topics(self, topics_text: str) -> List[Dict[str, float]]:
+    def _seek_index(self, path: str) -> Optional[SeekIndex]:
+        try:
+            return load_index(path)
+        except Exception as e:
+            logging.warning(f"Could not index {path} ({e}); topic boundaries stay where the LLM put them")
+            return None
+
+    def parse_topics(self, topics_text: str, index: SeekIndex = None, snap: float = TOPIC_KEYFRAME_SNAP) -> List[Dict[str, float]]:
+        # With a seek index, boundaries within snap seconds of a keyframe move onto it, so smart render can
+        # stream-copy from the cut instead of re-encoding the GOP it falls in
         parsed_topics = []
         for topic in topics_text.split('\n'):
             if topic.strip():
@@ -125,6 +254,11 @@ class VideoProcessor:
                         parsed_topics.append({'start': start, 'end': end})
                     except ValueError:
                         logging.warning(f"Invalid timestamp format: {topic}")
+        if index is not None and snap > 0:
+            for topic in parsed_topics:
+                start, end = index.snap(topic['start'], snap), index.snap(topic['end'], snap)
+                if start < end:
+                    topic['start'], topic['end'] = start, end
         return parsed_topics
 
     def load_transitions(self, transitions_file: str) -> Dict[str, Dict[str, any]]:
@@ -145,9 +279,8 @@ class VideoProcessor:
             logging.error(f"Error loading effects: {e}")
             return {}
 
-    def get_transition_suggestion(self, topic1: str, topic2: str, transitions: Dict[str, Dict[str, any]]) -> str:
-        transition_names = list(transitions.keys())
-        prompt = (
+    def _transition_prompt(self, topic1: str, topic2: str, transition_names: List[str]) -> str:
+        return (
             f"Given two consecutive video segments with the following topics:\n"
             f"1. {topic1}\n"
             f"2. {topic2}\n"
@@ -155,40 +288,118 @@ class VideoProcessor:
             f"{', '.join(transition_names)}\n"
             f"Respond with only the name of the transition effect."
         )
-        try:
-            response = LLM(prompt).strip()
-            return response if response in transitions else random.choice(transition_names)
-        except Exception as e:
-            logging.error(f"Error getting transition suggestion: {e}")
-            return random.choice(transition_names)
 
-    def get_effect_suggestion(self, topic: str, effects: Dict[str, Dict[str, any]]) -> str:
-        effect_names = list(effects.keys())
-        prompt = (
+    def _effect_prompt(self, topic: str, effect_names: List[str]) -> str:
+        return (
             f"Given a video segment with the following topic:\n"
             f"{topic}\n"
             f"Suggest the most suitable video effect from the following list:\n"
             f"{', '.join(effect_names)}\n"
             f"Respond with only the name of the effect."
         )
+
+    def _pick(self, response, options: Dict[str, Dict[str, any]]) -> str:
+        response = response.strip() if response else ''
+        return response if response in options else random.choice(list(options.keys()))
+
+    def get_transition_suggestion(self, topic1: str, topic2: str, transitions: Dict[str, Dict[str, any]]) -> str:
+        prompt = self._transition_prompt(topic1, topic2, list(transitions.keys()))
+        try:
+            return self._pick(LLM(prompt, self.classifier_context), transitions)
+        except Exception as e:
+            logging.error(f"Error getting transition suggestion: {e}")
+            return random.choice(list(transitions.keys()))
+
+    def get_effect_suggestion(self, topic: str, effects: Dict[str, Dict[str, any]]) -> str:
+        prompt = self._effect_prompt(topic, list(effects.keys()))
         try:
-            response = LLM(prompt).strip()
-            return response if response in effects else random.choice(effect_names)
+            return self._pick(LLM(prompt, self.classifier_context), effects)
         except Exception as e:
             logging.error(f"Error getting effect suggestion: {e}")
-            return random.choice(effect_names)
+            return random.choice(list(effects.keys()))
 
-    def apply_transition(self, clip1_path: str, clip2_path: str, transition_name: str, transitions_info: Dict[str, Dict[str, any]]) -> mp.VideoClip:
+    def get_edit_suggestions(self, parsed_topics: List[Dict[str, float]], effects: Dict[str, Dict[str, any]],
+                             transitions: Dict[str, Dict[str, any]]) -> tuple[List[str], List[str]]:
+        # Every effect and transition pick for the video goes out as one concurrent, rate-limited batch
+        topics = [f"Topic {i+1}" for i in range(len(parsed_topics))]
+        prompts = []
+        if effects:
+            prompts += [self._effect_prompt(topic, list(effects.keys())) for topic in topics]
+        if transitions:
+            prompts += [self._transition_prompt(topics[i-1], topics[i], list(transitions.keys())) for i in range(1, len(topics))]
+        try:
+            responses = LLM_batch(prompts, self.classifier_context) if prompts else []
+        except Exception as e:
+            logging.error(f"Error getting edit suggestions: {e}")
+            responses = [None] * len(prompts)
+        effect_names = [self._pick(r, effects) for r in responses[:len(topics)]] if effects else []
+        transition_responses = responses[len(topics):] if effects else responses
+        transition_names = [self._pick(r, transitions) for r in transition_responses] if transitions else []
+        return effect_names, transition_names
+
+    def select_edits(self, parsed_topics: List[Dict[str, float]], speech_segments: Optional[List[Dict]], source_path: str,
+                     effects: Dict[str, Dict[str, any]], transitions: Dict[str, Dict[str, any]],
+                     refine: bool = False) -> tuple[List[Optional[str]], List[Optional[str]]]:
+        # Local picks from frame and speech signals; with refine, one LLM call for the whole video may revise them
+        available_effects = [name for name in effects if hasattr(VideoEffects, name)]
+        available_transitions = [name for name in transitions if hasattr(TransitionEffects, name)]
+        with TRACER.span('select', topics=len(parsed_topics)):
+            frames = FrameSignals.from_video(source_path, SELECTOR_SAMPLE_FPS)
+            segments = segment_signals(frames, parsed_topics, speech_segments)
+            boundaries = boundary_signals(frames, parsed_topics, speech_segments, TRANSITION_DURATION)
+            selector = HeuristicSelector(available_effects, available_transitions)
+            effect_names, transition_names, reasons = selector.select(segments, boundaries)
+        for reason in reasons:
+            logging.info(f"Selected {reason}")
+        if not refine:
+            return effect_names, transition_names
+        prompt = refinement_prompt(segments, boundaries, effect_names, transition_names, available_effects, available_transitions)
+        try:
+            with TRACER.span('llm.refine'):
+                response = LLM(prompt, self.classifier_context)
+        except Exception as e:
+            logging.error(f"Error refining edit selection: {e}")
+            response = None
+        refined = parse_refinement(response, effect_names, transition_names, available_effects, available_transitions)
+        logging.info(f"LLM refinement changed {sum(a != b for a, b in zip(effect_names + transition_names, refined[0] + refined[1]))} picks")
+        return refined
+
+    def get_transition(self, transition_name: str, transitions_info: Dict[str, Dict[str, any]]):
+        if not transition_name:
+            return None
         transition_info = transitions_info.get(transition_name)
-        if transition_info and hasattr(transitions, transition_name):
+        transition_func = getattr(TransitionEffects, transition_name, None)
+        if transition_info and transition_func:
             logging.info(f"Applying transition: {transition_info['description']}")
-            transition_func = getattr(transitions, transition_name)
-            output_file = transition_info['output_file']
-            transition_func(clip1_path, clip2_path)
-            return mp.VideoFileClip(output_file)
-        else:
-            logging.warning(f"Transition '{transition_name}' not found or not implemented. Concatenating clips without transition.")
-            return mp.concatenate_videoclips([mp.VideoFileClip(clip1_path), mp.VideoFileClip(clip2_path)])
+            return transition_func
+        logging.warning(f"Transition '{transition_name}' not found or not implemented. Cutting without transition.")
+        return None
+
+    def apply_transition(self, clip1_path: str, clip2_path: str, transition_name: str, transitions_info: Dict[str, Dict[str, any]], output_path: str = None, profile: str = INTERMEDIATE_PROFILE, duration: float = TRANSITION_DURATION, kwargs: Dict = None) -> str:
+        # Renders just the overlap window and returns its path, or None for a hard cut
+        if not self.get_transition(transition_name, transitions_info):
+            return None
+        kwargs = dict(kwargs or {})
+        if kwargs.pop('duration', None) is not None:
+            # The overlap length is fixed by the timeline; a per-transition override would desync the splice
+            logging.warning(f"Ignoring 'duration' in the kwargs of transition '{transition_name}'; using {duration}s")
+        try:
+            return TransitionEffects.apply_transition(clip1_path, clip2_path, transition_name, duration=duration,
+                                                      output_path=output_path, profile=profile, **kwargs)
+        except Exception as e:
+            logging.warning(f"Transition '{transition_name}' failed ({e}). Cutting without transition.")
+            return None
+
+    def _cached_transition(self, clip1_path: str, clip2_path: str, transition_name: str, transitions_info: Dict[str, Dict[str, any]], key: str, duration: float = TRANSITION_DURATION, kwargs: Dict = None) -> Optional[str]:
+        if key is None:
+            return None
+        cached = self.render_cache.get(key)
+        if cached:
+            return cached
+        with TRACER.span('transition', transition=transition_name):
+            rendered = self.apply_transition(clip1_path, clip2_path, transition_name, transitions_info,
+                                             self.render_cache.scratch_path(key), duration=duration, kwargs=kwargs)
+        return self.render_cache.put(key, rendered) if rendered else None
 
     def apply_effect(self, clip: mp.VideoClip, effect_name: str, effects_info: Dict[str, Dict[str, any]]) -> mp.VideoClip:
         effect_info = effects_info.get(effect_name)
@@ -200,34 +411,85 @@ class VideoProcessor:
             logging.warning(f"Effect '{effect_name}' not found or not implemented. Returning original clip.")
             return clip
 
-    def process_video_segments(self, video: mp.VideoClip, parsed_topics: List[Dict[str, float]], output_dir: str, effects_info: Dict[str, Dict[str, any]]) -> List[str]:
-        segments = []
+    def process_video_segments(self, video: mp.VideoClip, parsed_topics: List[Dict[str, float]], output_dir: str, effects_info: Dict[str, Dict[str, any]], effect_names: List[str] = None, profile: str = INTERMEDIATE_PROFILE, segment_keys: List[str] = None) -> List[str]:
+        # With segment_keys, segments come from and go to the render cache; only misses are rendered
+        if effect_names is None:
+            effect_names, _ = self.get_edit_suggestions(parsed_topics, effects_info, {})
+        jobs = []
+        outputs = []
         for i, topic in enumerate(parsed_topics):
-            start_time, end_time = topic['start'], topic['end']
-            segment = video.subclip(start_time, end_time)
-            
-            effect_name = self.get_effect_suggestion(f"Topic {i+1}", effects_info)
-            segment_with_effect = self.apply_effect(segment, effect_name, effects_info)
-            
-            segment_path = os.path.join(output_dir, f"segment_{i}.mp4")
-            segment_with_effect.write_videofile(segment_path)
-            segments.append(segment_path)
-        return segments
+            cached = self.render_cache.get(segment_keys[i]) if segment_keys else None
+            outputs.append(cached)
+            if cached:
+                continue
+            effect_name = effect_names[i] if effect_names else None
+            effect_info = effects_info.get(effect_name)
+            if effect_info and hasattr(VideoEffects, effect_name):
+                logging.info(f"Segment {i}: applying effect: {effect_info['description']}")
+            elif effect_name:
+                logging.warning(f"Effect '{effect_name}' not found or not implemented. Keeping segment {i} unchanged.")
+                effect_name = None
+            jobs.append({
+                'index': i,
+                'source': video.filename,
+                'start': topic['start'],
+                'end': topic['end'],
+                'effect': effect_name,
+                'kwargs': topic.get('kwargs', {}),
+                'output': self.render_cache.scratch_path(segment_keys[i]) if segment_keys else os.path.join(output_dir, f"segment_{i}.mp4"),
+                'profile': profile,
+            })
+        if segment_keys:
+            logging.info(f"Reusing {len(parsed_topics) - len(jobs)} of {len(parsed_topics)} rendered segments")
+        rendered = self.renderer.render(jobs, video)
+        for job, output in zip(jobs, rendered):
+            outputs[job['index']] = self.render_cache.put(segment_keys[job['index']], output) if segment_keys else output
+        return outputs
+
+    def create_final_video(self, segments: List[str], transitions_info: Dict[str, Dict[str, any]], output_dir: str, transition_names: List[str] = None, profile: str = RENDER_PROFILE, transition_keys: List[str] = None, transition_duration: float = TRANSITION_DURATION, transition_kwargs: List[Dict] = None) -> str:
+        if transition_names is None and transitions_info:
+            _, transition_names = self.get_edit_suggestions([{}] * len(segments), {}, transitions_info)
+        transitions = []
+        if transitions_info:
+            transitions_dir = os.path.join(output_dir, "transitions")
+            os.makedirs(transitions_dir, exist_ok=True)
+            for i in range(1, len(segments)):
+                kwargs = transition_kwargs[i-1] if transition_kwargs else None
+                if transition_keys:
+                    transitions.append(self._cached_transition(segments[i-1], segments[i], transition_names[i-1],
+                                                               transitions_info, transition_keys[i-1],
+                                                               transition_duration, kwargs))
+                else:
+                    output_path = os.path.join(transitions_dir, f"transition_{i-1}_{i}.mp4")
+                    with TRACER.span('transition', transition=transition_names[i-1]):
+                        transitions.append(self.apply_transition(segments[i-1], segments[i], transition_names[i-1], transitions_info, output_path,
+                                                                 duration=transition_duration, kwargs=kwargs))
+        clips = [mp.VideoFileClip(path) for path in segments]
+        final_video = assemble_timeline(clips, transitions, transition_duration)
 
-    def create_final_video(self, segments: List[str], transitions_info: Dict[str, Dict[str, any]], output_dir: str):
-        final_video = mp.VideoFileClip(segments[0])
-        for i in range(1, len(segments)):
-            if transitions_info:
-                transition_name = self.get_transition_suggestion(f"Topic {i}", f"Topic {i+1}", transitions_info)
-                transition_clip = self.apply_transition(segments[i-1], segments[i], transition_name, transitions_info)
-                final_video = mp.concatenate_videoclips([final_video, transition_clip])
-            else:
-                final_video = mp.concatenate_videoclips([final_video, mp.VideoFileClip(segments[i])])
-    
         output_file = os.path.join(output_dir, "final_video_with_transitions.mp4")
-        final_video.write_videofile(output_file, codec='libx264')
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        with TRACER.span('encode.final', profile=profile) as span:
+            final_video.write_videofile(output_file, temp_audiofile=os.path.join(self.scratch_dir, "final_audio.m4a"),
+                                        **write_kwargs(profile))
+            span.add(frames=int(final_video.duration * final_video.fps), bytes_written=os.path.getsize(output_file))
+        for clip in clips:
+            clip.close()
         logging.info(f"Final video with transitions saved to {output_file}")
+        return output_file
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--preview', action='store_true', help="Render a low-res, low-fps preview from a cached proxy")
+    parser.add_argument('--reuse-plan', action='store_true', help=f"Render the edit decisions saved in {EDIT_PLAN_FILE}")
+    parser.add_argument('--sample-frames', type=int, metavar='N', default=TRACER.frame_sample_every,
+                        help="Time every Nth frame of each effect and transition kernel (0 disables)")
+    args = parser.parse_args()
+    setup_logging()
+    TRACER.frame_sample_every = args.sample_frames
     processor = VideoProcessor()
-    processor.process_video()
+    try:
+        processor.process_video(preview=args.preview, reuse_plan=args.reuse_plan)
+    finally:
+        TRACER.log_summary()
+        TRACER.export(processor.output_dir, TRACE_FILE, TRACE_CHROME_FILE)